@@ -0,0 +1,160 @@
+import gzip
+import json
+import os
+import re
+import time
+import zlib
+from collections import namedtuple
+
+from export import ENCODER
+from main import FileUtility
+
+SEGMENT_PATTERN = re.compile(r'^articles-(\d+)\.jsonl\.gz(\.part)?$')
+
+# What on_saved callbacks get for a flushed article (CrawlState.mark_saved reads url and post_id), so the
+# buffer does not keep each article's content alive next to its already encoded line
+SavedArticle = namedtuple('SavedArticle', ['url', 'post_id'])
+
+
+class PerFileSink:
+    # The original layout: one pretty-printed JSON file per article
+    def __init__(self, base_directory='./data', on_saved=None):
+        self.base_directory = base_directory
+        self.on_saved = on_saved
+        self.file_utilities = {}
+
+    def write(self, year, month, article):
+        key = (year, month)
+        if key not in self.file_utilities:
+            self.file_utilities[key] = FileUtility(year, month, self.base_directory)
+        self.file_utilities[key].save_article(article)
+        if self.on_saved:
+            self.on_saved([article])
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class MonthSegment:
+    # The open segment of one {year}_{month} directory and the articles buffered for it
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        numbers = [int(m.group(1)) for m in map(SEGMENT_PATTERN.match, os.listdir(directory)) if m]
+        self.number = max(numbers, default=0) + 1
+        self.file = None
+        self.size = 0
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.articles = []
+        self.last_flush = time.monotonic()
+
+    @property
+    def final_path(self):
+        return os.path.join(self.directory, f'articles-{self.number:05}.jsonl.gz')
+
+
+class JsonlSegmentSink:
+    # Appends articles to rotating gzip JSON Lines segments per {year}_{month}.
+    # Each flush appends one complete gzip member and fsyncs it, so a crash can only lose the
+    # unflushed buffer; finished segments are renamed from .part to .jsonl.gz atomically.
+    def __init__(self, base_directory='./data', flush_bytes=1024 * 1024, flush_interval=30.0,
+                 segment_bytes=64 * 1024 * 1024, on_saved=None):
+        self.base_directory = base_directory
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.on_saved = on_saved  # Called with the SavedArticles of each flush once they are on disk
+        self.segments = {}
+
+    def write(self, year, month, article):
+        key = (year, month)
+        if key not in self.segments:
+            self.segments[key] = MonthSegment(os.path.join(self.base_directory, f'{year}_{month}'))
+        segment = self.segments[key]
+
+        line = (ENCODER.encode(article.to_dict()) + '\n').encode('utf-8')
+        segment.buffer.append(line)
+        segment.buffer_bytes += len(line)
+        segment.articles.append(SavedArticle(article.url, article.post_id))
+
+        if segment.buffer_bytes >= self.flush_bytes or time.monotonic() - segment.last_flush >= self.flush_interval:
+            self.flush_segment(segment)
+
+    def flush_segment(self, segment):
+        if segment.buffer:
+            if segment.file is None:
+                segment.file = open(segment.final_path + '.part', 'ab')
+            member = gzip.compress(b''.join(segment.buffer))
+            segment.file.write(member)
+            segment.file.flush()
+            os.fsync(segment.file.fileno())
+            segment.size += len(member)
+            print(f"Flushed {len(segment.articles)} articles to {segment.final_path}.part")
+
+            flushed = segment.articles
+            segment.buffer, segment.buffer_bytes, segment.articles = [], 0, []
+            if self.on_saved:
+                self.on_saved(flushed)
+        segment.last_flush = time.monotonic()
+
+        if segment.file is not None and segment.size >= self.segment_bytes:
+            self.finish_segment(segment)
+
+    def finish_segment(self, segment):
+        segment.file.close()
+        os.replace(segment.final_path + '.part', segment.final_path)
+        print(f"Finished segment {segment.final_path}")
+        segment.file = None
+        segment.size = 0
+        segment.number += 1
+
+    def flush(self):
+        for segment in self.segments.values():
+            self.flush_segment(segment)
+
+    def close(self):
+        for segment in self.segments.values():
+            self.flush_segment(segment)
+            if segment.file is not None:
+                self.finish_segment(segment)
+        self.segments = {}
+
+
+def open_sink(output, on_saved=None, base_directory='./data'):
+    if output == 'files':
+        return PerFileSink(base_directory, on_saved=on_saved)
+    return JsonlSegmentSink(base_directory, on_saved=on_saved)
+
+
+def iter_segment_lines(path):
+    # Reads every complete gzip member; a truncated trailing member (crash mid-flush) is ignored
+    with open(path, 'rb') as f:
+        data = f.read()
+    while data:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            chunk = decompressor.decompress(data)
+        except zlib.error:
+            return
+        if not decompressor.eof:
+            return
+        yield from chunk.splitlines()
+        data = decompressor.unused_data
+
+
+def iter_month_articles(directory):
+    # Articles saved in one {year}_{month} directory, in either output layout
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        if filename.endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            yield from (data if isinstance(data, list) else [data])
+        elif SEGMENT_PATTERN.match(filename):
+            for line in iter_segment_lines(path):
+                if line.strip():
+                    yield json.loads(line)
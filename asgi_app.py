@@ -0,0 +1,167 @@
+import argparse
+from urllib.parse import parse_qsl, quote, urlencode
+
+from pymongo.errors import ConnectionFailure
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+from werkzeug.routing import Map, Rule
+
+import queries
+from export import API_ENCODER, EXPORT_FORMATS, ExportStream, accepts_gzip, export_headers
+from pagination import ARTICLE_FIELDS, InvalidPageRequest, fields_argument
+from search import page_arguments
+
+MONGO_URI = "mongodb://localhost:27017/"
+
+# Pool sized for many short concurrent reads instead of pymongo's 100-connection default that queues
+# behind slow aggregations: a warm minimum so bursts skip the handshake, and a bounded wait so an
+# overloaded server answers 503 quickly instead of piling up requests.
+POOL_OPTIONS = {
+    "maxPoolSize": 200,
+    "minPoolSize": 20,
+    "maxIdleTimeMS": 60000,
+    "waitQueueTimeoutMS": 2000,
+    "connectTimeoutMS": 2000,
+    "serverSelectionTimeoutMS": 5000,
+}
+
+# Panels /dashboard fetches concurrently when the caller does not pick them with ?panels=
+DASHBOARD_PANELS = ("top_keywords", "top_authors", "top_classes", "articles_by_language", "articles_by_thumbnail",
+                    "articles_by_month", "articles_by_word_count_range", "recent_articles")
+
+# Same paths, converters and endpoint names as flask_app.py, so both servers expose identical routes
+URL_MAP = Map([Rule(rule, endpoint=endpoint) for endpoint, rule in queries.ROUTES.items()]
+              + [Rule('/dashboard', endpoint="dashboard")])
+
+
+def motor_client(mongo_uri=MONGO_URI):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(mongo_uri, **POOL_OPTIONS)
+
+
+class AsyncArticlesApp:
+    # ASGI entry point serving flask_app.py's routes on motor: `uvicorn asgi_app:app`.
+    # Queries come from queries.py, so the JSON is byte-for-byte what the Flask app returns.
+    def __init__(self, client_factory=motor_client, allowed_origin="http://localhost:63342"):
+        self.client_factory = client_factory
+        self.allowed_origin = allowed_origin
+        self.client = None
+        self.db = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.handle(scope, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.connect()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.client is not None:
+                    self.client.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def connect(self):
+        # The motor client binds to the running loop, so it is created on startup rather than at import
+        if self.client is None:
+            self.client = self.client_factory()
+            self.db = self.client["almayadeen"]
+
+    async def handle(self, scope, send):
+        self.connect()
+        headers = {name.decode().lower(): value.decode() for name, value in scope["headers"]}
+        args = {}
+        for name, value in parse_qsl(scope["query_string"].decode()):
+            args.setdefault(name, value)  # First value wins, like request.args.get()
+
+        adapter = URL_MAP.bind(headers.get("host", "localhost"), url_scheme=scope.get("scheme", "http"))
+        try:
+            endpoint, view_args = adapter.match(scope["path"], method=scope["method"])
+        except NotFound:
+            return await self.send_json(send, headers, {"error": "not found"}, status=404)
+        except MethodNotAllowed:
+            return await self.send_json(send, headers, {"error": "method not allowed"}, status=405)
+
+        try:
+            if endpoint == "export_articles":
+                return await self.export(send, headers, args)
+            if endpoint == "dashboard":
+                return await self.send_json(send, headers, await self.dashboard(args))
+            if endpoint in queries.PAGE_QUERIES:
+                page = queries.PAGE_QUERIES[endpoint](**view_args)
+                items, next_cursor = await queries.run_page_async(self.db, page, args)
+                extra = {}
+                if next_cursor:
+                    # The same URL with only the cursor replaced; path params stay in the path
+                    next_url = (f"{scope.get('scheme', 'http')}://{headers.get('host', 'localhost')}"
+                                f"{quote(scope['path'])}?{urlencode({**args, 'cursor': next_cursor})}")
+                    extra = {"X-Next-Cursor": next_cursor, "Link": f'<{next_url}>; rel="next"'}
+                return await self.send_json(send, headers, items, extra_headers=extra)
+            if endpoint == "articles_containing_text":
+                page, per_page = page_arguments(args)
+                query = queries.articles_containing_text(view_args["text"], page, per_page)
+            elif endpoint == "dashboard_summary":
+                query = queries.dashboard_summary(*queries.facets_argument(args))
+            else:
+                query = queries.ROUTE_QUERIES[endpoint](**view_args)
+            return await self.send_json(send, headers, await queries.run_async(self.db, query))
+        except InvalidPageRequest as e:
+            return await self.send_json(send, headers, {"error": str(e)}, status=400)
+        except ConnectionFailure as e:
+            # No pooled connection within waitQueueTimeoutMS, or no server at all
+            return await self.send_json(send, headers, {"error": str(e)}, status=503)
+
+    async def dashboard(self, args):
+        # Several panels in one round trip: their queries run concurrently on the pool instead of one by one
+        panels = [panel for panel in args.get("panels", ",".join(DASHBOARD_PANELS)).split(",") if panel]
+        unknown = [panel for panel in panels if panel not in DASHBOARD_PANELS]
+        if unknown:
+            raise InvalidPageRequest(f"unknown panels: {', '.join(unknown)}")
+        combined = queries.Combined({panel: queries.ROUTE_QUERIES[panel]() for panel in panels})
+        return await queries.run_async(self.db, combined)
+
+    async def export(self, send, headers, args):
+        export_format = args.get("format", "ndjson")
+        if export_format not in EXPORT_FORMATS:
+            return await self.send_json(send, headers, {"error": f"unknown format: {export_format!r}"}, status=400)
+        export = queries.export_articles(fields_argument(args, ARTICLE_FIELDS))
+        compress = accepts_gzip(headers.get("accept-encoding"))
+
+        response_headers = {"Content-Type": EXPORT_FORMATS[export_format], **export_headers(compress)}
+        await self.start(send, headers, 200, response_headers)
+        stream = ExportStream(export_format, compress)
+        cursor = self.db[export.collection].find(export.filter, export.projection, sort=export.sort).batch_size(1000)
+        async for document in cursor:
+            for chunk in stream.add(document):
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"".join(stream.finish())})
+
+    async def send_json(self, send, headers, result, status=200, extra_headers=None):
+        body = (API_ENCODER.encode(result) + "\n").encode()  # Same bytes as jsonify()
+        await self.start(send, headers, status, {"Content-Type": "application/json",
+                                                 "Content-Length": str(len(body)), **(extra_headers or {})})
+        await send({"type": "http.response.body", "body": body})
+
+    async def start(self, send, headers, status, response_headers):
+        if headers.get("origin") == self.allowed_origin:
+            response_headers["Access-Control-Allow-Origin"] = self.allowed_origin
+            response_headers["Access-Control-Expose-Headers"] = "X-Next-Cursor, Link"
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(name.encode(), value.encode()) for name, value in response_headers.items()]})
+
+
+app = AsyncArticlesApp()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Serve the articles API on an async MongoDB driver")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=5001)
+    args = arg_parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
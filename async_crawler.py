@@ -0,0 +1,245 @@
+import asyncio
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from crawl_state import CrawlState
+from dedup import DedupIndex
+from extraction import DEFAULT_BACKEND
+from http_cache import HttpCache
+from http_transport import RETRY_STATUSES, HttpTransport
+from article_writer import open_sink
+from main import SITE_URL, ArticleScraper, SitemapParser, is_saved_post
+from scheduler import DEFAULT_RANGES, NEWEST_FIRST, ArticleBudget, AsyncHostLimiter, SitemapScheduler
+
+# Returned for URLs answered with one of RETRY_STATUSES: the URL goes back on the queue a few times
+# instead of failing, since the AIMD window has been cut by the time it comes up again
+RETRY = object()
+STOP = object()
+
+
+class TokenBucket:
+    # Allows `rate` requests per second on average, with bursts of up to `capacity`
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncArticleCrawler:
+    def __init__(self, max_in_flight=20, host_rate=10.0, host_burst=10, timeout=30, cache=None, state=None,
+                 backend=DEFAULT_BACKEND, dedup=None, limiter=None, max_requeues=2):
+        self.max_in_flight = max_in_flight
+        self.dedup = dedup  # DedupIndex; duplicates are dropped here and never yielded
+        # Per-host AIMD concurrency below max_in_flight, driven by latency and 429/5xx responses
+        self.limiter = limiter or AsyncHostLimiter(maximum=max_in_flight)
+        self.max_requeues = max_requeues
+        self.requeues = Counter()
+        self.backend = backend
+        self.cache = cache
+        self.state = state
+        # With a CrawlState, unchanged pages still get parsed (see ArticleScraper.skip_unchanged)
+        self.skip_unchanged = state is None
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.buckets = {}
+
+    def bucket_for(self, url):
+        # One token bucket per host so a slow site never starves the others
+        host = urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.host_rate, self.host_burst)
+        return self.buckets[host]
+
+    async def fetch_article(self, session, url):
+        # Returns an Article to save, None, or RETRY for throttled URLs that should be queued again
+        article = await self.download_and_parse(session, url)
+        if isinstance(article, aiohttp.ClientResponseError) and article.status in RETRY_STATUSES \
+                and self.requeues[url] < self.max_requeues:
+            self.requeues[url] += 1
+            return RETRY
+        failed = isinstance(article, Exception)
+        # Saved articles are marked done by the output sink once they are on disk
+        if article and not failed and (self.state is not None and is_saved_post(self.state, article)
+                                       or self.dedup is not None and self.dedup.check(article)):
+            if self.state is not None:
+                self.state.mark_duplicate(url, article.post_id)
+            return None
+        if self.state is not None:
+            if failed:
+                self.state.mark_failed(url, str(article))
+            elif not article:
+                self.state.mark_skipped(url)
+        return None if failed else article
+
+    async def download_and_parse(self, session, url):
+        # Returns an Article, None for pages that are skipped, or the exception for failed fetches
+        content = await self.download(session, url)
+        if content is None or isinstance(content, Exception):
+            return content
+        try:
+            # Parsed on a worker thread so the event loop keeps serving the other fetches meanwhile
+            return await asyncio.to_thread(ArticleScraper(url, backend=self.backend).parse, content)
+        except Exception as e:
+            print(f"Error scraping article {url}: {e}")
+            return e
+
+    async def download(self, session, url):
+        # Page body, None for unchanged pages that are skipped, or the exception. Only the request
+        # itself is timed for the host's AIMD window, not the parsing.
+        host = urlsplit(url).netloc
+        await self.bucket_for(url).acquire()
+        await self.limiter.acquire(host)
+        started = time.monotonic()
+        status = retry_after = None
+        try:
+            print(f"Scraping article: {url}")
+            headers = self.cache.conditional_headers(url) if self.cache else {}
+            async with session.get(url, headers=headers) as response:
+                status, retry_after = response.status, response.headers.get("Retry-After")
+                if response.status != 304:
+                    return await self.read_body(url, response)
+                if self.skip_unchanged:
+                    print(f"Skipping unchanged article since last crawl: {url}")
+                    return None
+                content = self.cache.load(url)
+                if content is not None:
+                    return content
+            # Cached body vanished, fall back to a full download
+            async with session.get(url) as response:
+                status, retry_after = response.status, response.headers.get("Retry-After")
+                return await self.read_body(url, response)
+        except Exception as e:
+            print(f"Error scraping article {url}: {e}")
+            return e
+        finally:
+            await self.limiter.release(host, time.monotonic() - started, status, retry_after)
+
+    async def read_body(self, url, response):
+        response.raise_for_status()  # Raise an error for HTTP issues
+        content = await response.read()
+        unchanged = self.cache is not None and self.cache.store(url, response.headers, content)
+        if unchanged and self.skip_unchanged:
+            print(f"Skipping unchanged article since last crawl: {url}")
+            return None
+        return content
+
+    async def crawl(self, urls, max_articles=None, budget=None):
+        # Yields Article objects as they complete; at most max_in_flight fetches run at once, fewer per
+        # host while its AIMD window is smaller. A shared ArticleBudget caps articles across crawl() calls.
+        if self.state is not None:
+            urls = [url for url in urls if not self.state.is_done(url)]
+        budget = budget or ArticleBudget(max_articles)
+        queue = asyncio.Queue()
+        for url in urls:
+            queue.put_nowait(url)
+        results = asyncio.Queue()
+
+        async def worker(session):
+            try:
+                while True:
+                    if not budget.reserve():
+                        # Wait for an in-flight page to turn out not to be an article, unless none can
+                        if budget.exhausted or queue.empty():
+                            return
+                        await asyncio.sleep(0.05)
+                        continue
+                    try:
+                        url = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        budget.release()
+                        return
+                    article = await self.fetch_article(session, url)
+                    if article is RETRY:
+                        queue.put_nowait(url)
+                        article = None
+                    budget.release(saved=bool(article))
+                    if article:
+                        await results.put(article)
+            finally:
+                results.put_nowait(STOP)
+
+        async with aiohttp.ClientSession(timeout=self.timeout) as session:
+            workers = [asyncio.create_task(worker(session)) for _ in range(min(self.max_in_flight, len(urls)))]
+            try:
+                stopped = 0
+                while stopped < len(workers):
+                    article = await results.get()
+                    if article is STOP:
+                        stopped += 1
+                        continue
+                    yield article
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def main_async(max_articles=2000, max_in_flight=20, host_rate=10.0, backend=DEFAULT_BACKEND,
+                     output='jsonl', base_url=SITE_URL, ranges=DEFAULT_RANGES, policy=NEWEST_FIRST,
+                     recrawl_after=None):
+    cache = HttpCache()
+    transport = HttpTransport(cache=cache)
+    state = CrawlState()
+    dedup = DedupIndex()
+    budget = ArticleBudget(max_articles)
+    sink = open_sink(output, on_saved=state.mark_saved)
+    parser = SitemapParser(transport, base_url)
+    scheduler = SitemapScheduler(parser, state, ranges, policy, recrawl_after)
+    crawler = AsyncArticleCrawler(max_in_flight=max_in_flight, host_rate=host_rate, cache=cache, state=state,
+                                  backend=backend, dedup=dedup)
+
+    try:
+        for sitemap_url in scheduler.sitemap_urls():
+            print(f"Processing sitemap: {sitemap_url}")
+            year, month = sitemap_url.split('-')[-2], sitemap_url.split('-')[-1].replace('.xml', '')
+            article_urls = await asyncio.to_thread(parser.get_article_urls, sitemap_url)
+
+            if not article_urls:
+                print("No articles found.")
+                continue
+
+            state.add_pending(sitemap_url, article_urls)
+            async for article in crawler.crawl(article_urls, budget=budget):
+                sink.write(year, month, article)
+                print(f"Processed article {budget.saved}/{max_articles}")
+
+            sink.flush()
+            state.finish_sitemap(sitemap_url)
+            print(f"Processed {len(article_urls)} articles for {year}-{month}. Total so far: {budget.saved}")
+
+            if budget.exhausted:
+                print(f"Reached {max_articles} articles. Stopping.")
+                break
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    finally:
+        sink.close()
+        transport.print_stats()
+        transport.close()
+        crawler.limiter.print_stats()
+        state.print_stats()
+        state.close()
+        dedup.print_stats()
+        dedup.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import logging
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import aiohttp
+
+# A dashboard-like mix: rollup reads, per-request aggregations, paginated lists and a point lookup
+ROUTES = [
+    "/top_keywords",
+    "/top_authors",
+    "/articles_by_language",
+    "/articles_by_month",
+    "/articles_by_word_count_range",
+    "/articles_by_keyword_count",
+    "/recent_articles",
+    "/article_details?limit=100",
+    "/articles_with_more_than/1000?limit=50",
+    "/articles_by_keyword/keyword-1?limit=50",
+    "/article_details/100",
+]
+
+
+def synthetic_article(post_id):
+    published = datetime(2020, 11, 30) - timedelta(hours=post_id)
+    return {
+        "post_id": str(post_id),
+        "url": f"https://www.almayadeen.net/article/{post_id}",
+        "title": " ".join(["عنوان"] * random.randint(3, 15)),
+        "author": f"Author {post_id % 50}",
+        "keywords": [f"keyword-{random.randint(0, 200)}" for _ in range(random.randint(0, 8))],
+        "classes": [{"key": "coverage", "value": f"class-{post_id % 12}"}],
+        "lang": "ar",
+        "thumbnail": None if post_id % 4 else f"https://www.almayadeen.net/thumb/{post_id}.jpg",
+        "content": " ".join(["كلمة"] * random.randint(50, 6000)),
+        "publication_date": published.isoformat() + "+00:00",
+        "last_updated_date": (published + timedelta(hours=post_id % 3)).isoformat() + "+00:00",
+        "year": str(published.year),
+        "month": str(published.month),
+    }
+
+
+def in_memory_client(articles):
+    # mongomock stands in for mongod: numbers then compare the servers' own overhead, not the database
+    import mongomock
+    from inserting_data import batched, upsert_batch
+
+    client = mongomock.MongoClient()
+    collection = client["almayadeen"]["articles"]
+    random.seed(0)
+    for batch in batched((synthetic_article(post_id) for post_id in range(articles)), 500):
+        upsert_batch(collection, batch)  # Also fills the rollup collections
+    return client
+
+
+def serve(mode, port, articles):
+    # Runs in a child process so each server gets its own interpreter and GIL
+    mongomock_client = in_memory_client(articles) if articles else None
+
+    if mode == "flask":
+        if mongomock_client is not None:
+            import pymongo
+            pymongo.MongoClient = lambda *args, **kwargs: mongomock_client
+        from werkzeug.serving import make_server
+        import flask_app
+        flask_app.response_cache.enabled = False  # Compare query paths, not cache hits
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)  # No per-request access log
+        make_server("127.0.0.1", port, flask_app.app, threaded=True).serve_forever()
+    else:
+        import uvicorn
+        import asgi_app
+        if mongomock_client is not None:
+            from mongomock_motor import AsyncMongoMockClient
+            asgi_app.app.client_factory = lambda: AsyncMongoMockClient(mock_mongo_client=mongomock_client)
+        uvicorn.run(asgi_app.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def wait_until_up(base_url, timeout=120):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(base_url + "/top_keywords") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{base_url} did not come up")
+
+
+async def load_test(base_url, concurrency, duration):
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def worker(offset):
+        nonlocal errors
+        i = offset
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                async with session.get(base_url + ROUTES[i % len(ROUTES)]) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+            i += 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def percentile(ordered, fraction):
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare the Flask (threads + pymongo) and ASGI (motor) servers")
+    arg_parser.add_argument("--modes", default="flask,asgi")
+    arg_parser.add_argument("--concurrency", type=int, default=32)
+    arg_parser.add_argument("--duration", type=float, default=15.0, help="seconds of load per mode")
+    arg_parser.add_argument("--in-memory", type=int, default=0, metavar="ARTICLES",
+                            help="serve this many synthetic articles from mongomock instead of the local mongod")
+    arg_parser.add_argument("--port", type=int, default=5050)
+    arg_parser.add_argument("--serve", choices=["flask", "asgi"], help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.in_memory)
+        return
+
+    print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for mode in args.modes.split(","):
+        server = subprocess.Popen([sys.executable, __file__, "--serve", mode, "--port", str(args.port),
+                                   "--in-memory", str(args.in_memory)])
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            asyncio.run(wait_until_up(base_url))
+            latencies, errors, elapsed = asyncio.run(load_test(base_url, args.concurrency, args.duration))
+        finally:
+            server.terminate()
+            server.wait()
+        ordered = sorted(latencies)
+        print(f"{mode:<8}{len(ordered) / elapsed:>10.1f}{percentile(ordered, 0.5):>10.1f}"
+              f"{percentile(ordered, 0.99):>10.1f}{errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
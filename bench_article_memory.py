@@ -0,0 +1,66 @@
+import argparse
+import contextlib
+import io
+import json
+import tracemalloc
+from dataclasses import asdict, make_dataclass
+
+from article_writer import LINE_ENCODER
+from main import ARTICLE_FIELDS, Article, ArticleScraper
+from mock_site import render_article
+
+# The Article record as it was before slots and interning: a __dict__ per instance and its own strings
+PlainArticle = make_dataclass("PlainArticle", ARTICLE_FIELDS)
+
+
+# Retained memory per article and serialization allocations, compact Article vs the plain dataclass
+def parse_articles(count, paragraphs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [ArticleScraper(f"https://www.almayadeen.net/article/{post_id}").parse(
+            render_article(post_id, paragraphs=paragraphs)) for post_id in range(count)]
+
+
+def retained(build):
+    # Bytes still allocated once build() returns, with its result kept alive
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def peak(serialize, articles):
+    # Largest transient allocation while serializing the articles one at a time, as the sinks do
+    tracemalloc.start()
+    for article in articles:
+        serialize(article)
+    result = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure Article memory and serialization allocations")
+    arg_parser.add_argument("--articles", type=int, default=1000)
+    arg_parser.add_argument("--paragraphs", type=int, default=0,
+                            help="article body size; 0 isolates the per-record overhead from the content")
+    args = arg_parser.parse_args()
+
+    # Both records are built from freshly decoded values, so every article starts with its own copy
+    # of each string, as json.loads leaves it for each page
+    encoded = [json.dumps(article.values()) for article in parse_articles(args.articles, args.paragraphs)]
+    compact_bytes, compact = retained(lambda: [Article(*json.loads(values)) for values in encoded])
+    plain_bytes, plain = retained(lambda: [PlainArticle(*json.loads(values)) for values in encoded])
+
+    print(f"--- {args.articles} articles, {args.paragraphs} paragraphs each")
+    print(f"{'retained per article':<28}{'plain':>10} {plain_bytes / len(plain):8.0f} B"
+          f"   {'compact':>10} {compact_bytes / len(compact):8.0f} B")
+    asdict_peak = peak(lambda article: json.dumps(asdict(article), ensure_ascii=False), plain)
+    to_dict_peak = peak(lambda article: LINE_ENCODER.encode(article.to_dict()), compact)
+    print(f"{'serialize, peak':<28}{'asdict':>10} {asdict_peak:8.0f} B"
+          f"   {'to_dict':>10} {to_dict_peak:8.0f} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from async_crawler import AsyncArticleCrawler
+from http_transport import HttpTransport
+from main import ArticleScraper
+from mock_site import start_mock_site
+
+
+# Compares the sequential ArticleScraper loop with AsyncArticleCrawler against the local mock site
+def run_sequential(urls):
+    articles = []
+    with HttpTransport() as transport:
+        for url in urls:
+            article = ArticleScraper(url, transport).scrape()
+            if article:
+                articles.append(article)
+    return articles
+
+
+async def run_async(urls, max_in_flight, host_rate):
+    crawler = AsyncArticleCrawler(max_in_flight=max_in_flight, host_rate=host_rate, host_burst=max_in_flight)
+    return [article async for article in crawler.crawl(urls)]
+
+
+def timed(label, func, count):
+    # Silence the per-article prints so they do not skew the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        articles = func()
+        elapsed = time.perf_counter() - start
+    print(f"{label:<12} {len(articles):>5} articles in {elapsed:7.2f}s  ({count / elapsed:8.1f} pages/sec)")
+    return articles
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the sequential and async crawl engines")
+    arg_parser.add_argument("--pages", type=int, default=200)
+    arg_parser.add_argument("--latency", type=float, default=0.05, help="simulated server latency in seconds")
+    arg_parser.add_argument("--in-flight", type=int, default=20)
+    arg_parser.add_argument("--host-rate", type=float, default=1000.0, help="token bucket refill rate per host")
+    args = arg_parser.parse_args()
+
+    site = start_mock_site(latency=args.latency)
+    urls = [f"{site.base_url}/article/{post_id}" for post_id in range(args.pages)]
+    try:
+        sequential = timed("sequential", lambda: run_sequential(urls), len(urls))
+        concurrent = timed("async", lambda: asyncio.run(run_async(urls, args.in_flight, args.host_rate)), len(urls))
+    finally:
+        site.shutdown()
+
+    same = sorted(a.post_id for a in sequential) == sorted(a.post_id for a in concurrent)
+    print(f"Same articles from both engines: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from extraction import BACKENDS, DEFAULT_BACKEND
+from mock_site import start_mock_site
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+# Runs main.py's crawl end to end against the local mock site, one engine at a time, each in a fresh
+# working directory so no engine starts with another's crawl state or HTTP cache
+def directory_bytes(path, exclude=()):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files
+                     if not name.startswith(exclude))
+    return total
+
+
+def url_counts(workdir):
+    # URLs per crawl state status: 'done' are the saved articles
+    path = os.path.join(workdir, "data", "crawl_state.sqlite")
+    if not os.path.exists(path):
+        return {}
+    with sqlite3.connect(path) as db:
+        return dict(db.execute("SELECT status, COUNT(*) FROM urls GROUP BY status").fetchall())
+
+
+def run_crawl(engine, base_url, args):
+    workdir = tempfile.mkdtemp(prefix=f"bench_crawl_{engine}_")
+    command = [sys.executable, MAIN, "--engine", engine, "--base-url", base_url, "--max-articles",
+               str(args.articles), "--backend", args.backend, "--output", args.output,
+               "--host-rate", str(args.host_rate)]
+    if args.max_in_flight:
+        command += ["--max-in-flight", str(args.max_in_flight)]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=workdir, stdout=subprocess.DEVNULL)
+    # wait4 reports this child's own usage (its parse workers included), unlike RUSAGE_CHILDREN,
+    # whose peak RSS would carry over from the previous engine
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.perf_counter() - start
+
+    counts = url_counts(workdir)
+    result = {
+        "exit": process.returncode,
+        "articles": counts.get("done", 0),
+        "duplicates": counts.get("duplicate", 0),
+        "seconds": elapsed,
+        "cpu_seconds": usage.ru_utime + usage.ru_stime,
+        "peak_rss_mb": usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+        "output_bytes": directory_bytes(os.path.join(workdir, "data"), exclude=("crawl_state.sqlite",)),
+        "cache_bytes": directory_bytes(os.path.join(workdir, "cache")),
+    }
+    if args.keep:
+        print(f"{engine}: crawl output kept in {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the crawl engines end to end on the local mock site")
+    arg_parser.add_argument("--engines", default="sequential,async,pipeline")
+    arg_parser.add_argument("--articles", type=int, default=500, help="max_articles for each crawl")
+    arg_parser.add_argument("--latency", type=float, default=0.02, help="simulated server latency in seconds")
+    arg_parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency of up to this many seconds")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of article requests answered 503")
+    arg_parser.add_argument("--duplicate-rate", type=float, default=0.0,
+                            help="fraction of article URLs that repeat another article, exactly or with an update")
+    arg_parser.add_argument("--paragraphs", type=int, default=8, help="article body size")
+    arg_parser.add_argument("--chrome-links", type=int, default=150, help="navigation markup around the body")
+    arg_parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    arg_parser.add_argument("--output", choices=["jsonl", "files"], default="jsonl")
+    arg_parser.add_argument("--max-in-flight", type=int, help="concurrent fetches for the async and pipeline engines")
+    arg_parser.add_argument("--host-rate", type=float, default=10.0,
+                            help="requests per second to the mock site for the async engine")
+    arg_parser.add_argument("--keep", action="store_true", help="keep each engine's data and cache directories")
+    args = arg_parser.parse_args()
+
+    site = start_mock_site(latency=args.latency, latency_jitter=args.jitter, error_rate=args.error_rate,
+                           paragraphs=args.paragraphs, chrome_links=args.chrome_links,
+                           duplicate_rate=args.duplicate_rate)
+    print(f"--- {args.articles} articles, {args.latency * 1000:.0f} ms latency, {args.error_rate:.0%} errors, "
+          f"{args.duplicate_rate:.0%} duplicate URLs, "
+          f"backend={args.backend}, output={args.output}, host rate={args.host_rate:g}/s, "
+          f"max in flight={args.max_in_flight or 'engine default'}")
+    print(f"{'engine':<12}{'articles':>9}{'pages/s':>10}{'CPU ms/page':>13}{'peak RSS MB':>13}"
+          f"{'written KB':>12}{'cache MB':>10}{'served MB':>11}{'errors':>8}{'dupes':>7}")
+    try:
+        for engine in args.engines.split(","):
+            before = dict(site.stats)
+            result = run_crawl(engine, site.base_url, args)
+            served = {key: site.stats[key] - before[key] for key in before}
+            articles = max(result["articles"], 1)
+            print(f"{engine:<12}{result['articles']:>9}{result['articles'] / result['seconds']:>10.1f}"
+                  f"{result['cpu_seconds'] / articles * 1000:>13.2f}{result['peak_rss_mb']:>13.1f}"
+                  f"{result['output_bytes'] / 1e3:>12.1f}{result['cache_bytes'] / 1e6:>10.2f}"
+                  f"{served['bytes'] / 1e6:>11.2f}{served['errors']:>8}{result['duplicates']:>7}")
+            if result["exit"]:
+                print(f"Warning: {engine} crawl exited with status {result['exit']}")
+    finally:
+        site.shutdown()
+
+
+if __name__ == "__main__":
+    main()
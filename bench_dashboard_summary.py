@@ -0,0 +1,69 @@
+import argparse
+import time
+
+import pymongo
+
+# The routes the dashboard pages call one by one, and the /dashboard_summary facet each corresponds to
+DASHBOARD_ROUTES = {
+    "top_keywords": "/top_keywords",
+    "top_authors": "/top_authors",
+    "top_classes": "/top_classes",
+    "languages": "/articles_by_language",
+    "thumbnails": "/articles_by_thumbnail",
+    "days": "/articles_by_publication_date",
+}
+
+
+def time_requests(client, paths, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def time_queries(db, query_list, repeat):
+    from queries import run
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in query_list:
+            run(db, query)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Compare /dashboard_summary with the individual dashboard routes")
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    arg_parser.add_argument("--in-memory", type=int, default=0, metavar="ARTICLES",
+                            help="use this many synthetic articles in mongomock instead of the local mongod")
+    args = arg_parser.parse_args()
+
+    if args.in_memory:
+        from bench_api_modes import in_memory_client
+        client = in_memory_client(args.in_memory)
+        pymongo.MongoClient = lambda *a, **kw: client
+
+    import flask_app
+    import queries
+    flask_app.response_cache.enabled = False  # Every request reaches MongoDB
+    test_client = flask_app.app.test_client()
+    facets = list(DASHBOARD_ROUTES)
+
+    # What each route cost before the rollups: its own aggregation over every article
+    scans = [queries.dashboard_summary([facet], "facet") for facet in facets]
+    results = {
+        "individual routes (rollups)": time_requests(test_client, DASHBOARD_ROUTES.values(), args.repeat),
+        "/dashboard_summary (rollups)": time_requests(test_client, ["/dashboard_summary"], args.repeat),
+        "/dashboard_summary?source=facet": time_requests(test_client, ["/dashboard_summary?source=facet"],
+                                                         args.repeat),
+        "one scan per route (no rollups)": time_queries(flask_app.db, scans, args.repeat),
+    }
+    articles = flask_app.collection.estimated_document_count()
+    print(f"--- one dashboard load, {len(facets)} facets, {articles} articles")
+    for name, ms in results.items():
+        print(f"{name:<34} {ms:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
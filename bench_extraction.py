@@ -0,0 +1,85 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+
+from extraction import BACKENDS
+from main import ArticleScraper
+from mock_site import render_article
+
+
+# Saved pages (name.html) with the Article each must parse to (name.json, null for pages that are skipped):
+# real-world encodings and the markup edge cases every backend has to agree on
+GOLDEN_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata", "extraction")
+
+
+# Checks every extraction backend against the golden Articles, or the full html.parser reference for
+# pages without one, and times each backend per page
+def synthetic_corpus(count):
+    pages = {f"article_{post_id}.html": render_article(post_id, paragraphs=30) for post_id in range(count)}
+    pages.update(load_corpus(GOLDEN_DIRECTORY))
+    return pages
+
+
+def load_corpus(directory):
+    # Saved article pages (*.html), from the real site or the golden corpus
+    pages = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".html"):
+            with open(os.path.join(directory, filename), "rb") as f:
+                pages[filename] = f.read()
+    return pages
+
+
+def load_expected(filename, directory=GOLDEN_DIRECTORY):
+    # The golden Article dict for a page, None for a page that is not an article, KeyError without one
+    path = os.path.join(directory, filename[:-len(".html")] + ".json")
+    if not os.path.exists(path):
+        raise KeyError(filename)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def page_url(filename):
+    return f"https://www.almayadeen.net/{filename[:-len('.html')]}"
+
+
+def parse_all(pages, backend):
+    articles = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for name, content in pages.items():
+            try:
+                article = ArticleScraper(page_url(name), backend=backend).parse(content)
+                articles[name] = article.to_dict() if article else None
+            except Exception as e:
+                articles[name] = f"error: {type(e).__name__}"
+        elapsed = time.perf_counter() - start
+    return articles, elapsed
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Verify and benchmark article extraction backends")
+    arg_parser.add_argument("--corpus", help="directory of saved article .html pages (default: synthetic)")
+    arg_parser.add_argument("--pages", type=int, default=300)
+    args = arg_parser.parse_args()
+
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.pages)
+    reference, _ = parse_all(pages, "soup")
+    for name in pages:
+        try:
+            reference[name] = load_expected(name, args.corpus or GOLDEN_DIRECTORY)
+        except KeyError:
+            pass
+
+    for backend in BACKENDS:
+        articles, elapsed = parse_all(pages, backend)
+        mismatches = [name for name in pages if articles[name] != reference[name]]
+        status = "identical" if not mismatches else f"{len(mismatches)} mismatches, e.g. {mismatches[:3]}"
+        print(f"{backend:<10} {elapsed / len(pages) * 1000:7.3f} ms/page   {status}")
+
+
+if __name__ == "__main__":
+    main()
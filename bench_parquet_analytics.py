@@ -0,0 +1,75 @@
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+import pymongo
+
+import parquet_analytics
+from bench_api_modes import synthetic_article
+from inserting_data import batched, upsert_batch
+from parquet_export import MONGO_PROJECTION, export_parquet, open_dataset
+from queries import articles_by_word_count_range
+from rollups import ROLLUP_PIPELINES
+
+TOP_STAGES = [{"$sort": {"count": -1, "_id": 1}}, {"$limit": 10}]
+
+# What the analysts run against MongoDB today: the rollup pipelines over the articles collection
+# (the rollup collections only answer the dashboard's fixed questions) and the word-count $bucket
+MONGO_QUERIES = {
+    "top_keywords": lambda c: list(c.aggregate(ROLLUP_PIPELINES["keyword_counts"] + TOP_STAGES)),
+    "top_authors": lambda c: list(c.aggregate(ROLLUP_PIPELINES["author_counts"] + TOP_STAGES)),
+    "top_classes": lambda c: list(c.aggregate(ROLLUP_PIPELINES["class_counts"] + TOP_STAGES)),
+    "articles_per_day": lambda c: list(c.aggregate(ROLLUP_PIPELINES["day_counts"] + [{"$sort": {"_id": 1}}])),
+    "articles_by_word_count_range": lambda c: list(c.aggregate(articles_by_word_count_range().pipeline)),
+}
+
+
+def time_query(query, source, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = query(source)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the Parquet analytics against MongoDB aggregations")
+    arg_parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    arg_parser.add_argument("--in-memory", action="store_true", help="use mongomock instead of a mongod")
+    arg_parser.add_argument("--articles", type=int, default=20000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    if args.in_memory:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        client = pymongo.MongoClient(args.mongo_uri)
+    # A scratch database, so the real articles collection is never touched
+    collection = client["almayadeen_bench"]["articles"]
+    collection.drop()
+    output = tempfile.mkdtemp(prefix="bench_parquet_")
+
+    try:
+        random.seed(0)
+        for batch in batched((synthetic_article(post_id) for post_id in range(args.articles)), 1000):
+            upsert_batch(collection, batch)
+
+        start = time.perf_counter()
+        export_parquet(collection.find({}, MONGO_PROJECTION), output)
+        print(f"--- {args.articles} articles, exported in {time.perf_counter() - start:.1f}s")
+        dataset = open_dataset(output)
+
+        for name, mongo_query in MONGO_QUERIES.items():
+            mongo_ms, expected = time_query(mongo_query, collection, args.repeat)
+            parquet_ms, result = time_query(parquet_analytics.REPORTS[name], dataset, args.repeat)
+            match = "same" if result == expected else "DIFFERENT"
+            print(f"{name:<32} mongo {mongo_ms:9.1f} ms   parquet {parquet_ms:7.1f} ms   {match}")
+    finally:
+        client.drop_database("almayadeen_bench")
+        shutil.rmtree(output, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from http_cache import FetchResult
+from main import ArticleScraper
+from mock_site import render_article
+from pipeline import CrawlPipeline
+
+
+# Feeds in-memory pages through CrawlPipeline with a growing parser pool to show how parsing scales with cores
+def run_in_process(pages):
+    return sum(1 for url, content in pages.items() if ArticleScraper(url).parse(content))
+
+
+def run_pipeline(pages, parse_workers):
+    with CrawlPipeline(lambda url: FetchResult(pages[url], False), fetch_workers=4,
+                       parse_workers=parse_workers) as pipeline:
+        return sum(1 for url, article, error in pipeline.run(list(pages)) if article)
+
+
+def timed(func):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        count = func()
+        return count, time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark parse throughput against process pool size")
+    arg_parser.add_argument("--pages", type=int, default=2000)
+    arg_parser.add_argument("--workers", default="1,2,4,8,16", help="comma separated parser pool sizes")
+    args = arg_parser.parse_args()
+
+    pages = {f"https://www.almayadeen.net/article/{post_id}": render_article(post_id, paragraphs=30)
+             for post_id in range(args.pages)}
+    print(f"{os.cpu_count()} CPUs available, {len(pages)} pages")
+
+    count, baseline = timed(lambda: run_in_process(pages))
+    print(f"{'in-process':<12} {count:>6} articles  {count / baseline:8.1f} pages/sec  x1.00")
+    for workers in (int(w) for w in args.workers.split(",")):
+        count, elapsed = timed(lambda: run_pipeline(pages, workers))
+        print(f"{f'{workers} workers':<12} {count:>6} articles  {count / elapsed:8.1f} pages/sec  "
+              f"x{baseline / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
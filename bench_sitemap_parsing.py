@@ -0,0 +1,64 @@
+import argparse
+import gzip
+import multiprocessing
+import resource
+import time
+
+from bs4 import BeautifulSoup
+
+from mock_site import render_sitemap
+from sitemap_stream import iter_sitemap_entries
+
+
+# Compares whole-document BeautifulSoup parsing with the streaming reader on a synthetic sitemap
+def parse_with_soup(data):
+    soup = BeautifulSoup(data, 'xml')
+    return [loc.text for loc in soup.find_all('loc')]
+
+
+def parse_streaming(data, chunk_size=64 * 1024):
+    chunks = (data[start:start + chunk_size] for start in range(0, len(data), chunk_size))
+    return [loc for kind, loc in iter_sitemap_entries(chunks)]
+
+
+def measure(method, url_count, compressed, results):
+    data = render_sitemap("https://www.almayadeen.net", range(url_count))
+    if compressed:
+        data = gzip.compress(data)
+    func = parse_streaming if method == "streaming" else parse_with_soup
+    if compressed and method == "soup":
+        func = lambda payload: parse_with_soup(gzip.decompress(payload))  # noqa: E731
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    urls = func(data)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((len(urls), elapsed, (rss_after - rss_before) / 1024, len(data)))
+
+
+def run_isolated(method, url_count, compressed):
+    # Each run gets its own process so peak RSS is not shared between methods
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=measure, args=(method, url_count, compressed, results))
+    process.start()
+    outcome = results.get()
+    process.join()
+    return outcome
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark sitemap parsing time and memory")
+    arg_parser.add_argument("--urls", type=int, default=50000)
+    args = arg_parser.parse_args()
+
+    for compressed in (False, True):
+        for method in ("soup", "streaming"):
+            count, elapsed, peak_mb, size = run_isolated(method, args.urls, compressed)
+            label = f"{method}{' (.xml.gz)' if compressed else ''}"
+            print(f"{label:<22} {count:>7} urls from {size / 1024 / 1024:6.2f} MB in {elapsed:6.2f}s, "
+                  f"peak RSS +{peak_mb:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import random
+import time
+
+import pymongo
+
+from indexes import ensure_indexes
+from normalization import normalize_document
+
+# The pipelines the length endpoints used to run, tokenizing every article body per request
+SPLIT_QUERIES = {
+    "longest_articles": lambda c: list(c.aggregate([
+        {"$project": {"title": 1, "word_count": {"$size": {"$split": ["$content", " "]}}}},
+        {"$sort": {"word_count": -1}}, {"$limit": 10}])),
+    "articles_with_more_than/5000": lambda c: list(c.aggregate([
+        {"$project": {"title": 1, "url": 1, "word_count": {"$size": {"$split": ["$content", " "]}}}},
+        {"$match": {"word_count": {"$gt": 5000}}}, {"$sort": {"word_count": -1}}])),
+    "articles_by_word_count_range": lambda c: list(c.aggregate([
+        {"$project": {"word_count": {"$size": {"$split": ["$content", " "]}}}},
+        {"$bucket": {"groupBy": "$word_count", "boundaries": [0, 100, 500, 1000, 5000, 10000],
+                     "default": "Over 10,000", "output": {"count": {"$sum": 1}}}}])),
+}
+
+# The same endpoints on the stored, indexed word_count
+STORED_QUERIES = {
+    "longest_articles": lambda c: list(c.find({}, {"title": 1, "word_count": 1}).sort("word_count", -1).limit(10)),
+    "articles_with_more_than/5000": lambda c: list(
+        c.find({"word_count": {"$gt": 5000}}, {"title": 1, "url": 1, "word_count": 1, "_id": 0})
+        .sort("word_count", -1)),
+    "articles_by_word_count_range": lambda c: list(c.aggregate([
+        {"$match": {"word_count": {"$gte": 0}}},
+        {"$bucket": {"groupBy": "$word_count", "boundaries": [0, 100, 500, 1000, 5000, 10000],
+                     "default": "Over 10,000", "output": {"count": {"$sum": 1}}}}])),
+}
+
+
+def synthetic_article(post_id):
+    words = random.randint(50, 6000)
+    return normalize_document({
+        "post_id": str(post_id),
+        "url": f"https://www.almayadeen.net/article/{post_id}",
+        "title": " ".join(["title"] * random.randint(3, 15)),
+        "keywords": ["news"] * random.randint(0, 8),
+        "content": " ".join(["word"] * words),
+        "publication_date": "2020-11-01T10:00:00+03:00",
+    })
+
+
+def time_query(query, collection, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        query(collection)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark word-count endpoints as the collection grows")
+    arg_parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    arg_parser.add_argument("--sizes", default="1000,10000,50000")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    # A scratch database, so the real articles collection is never touched
+    client = pymongo.MongoClient(args.mongo_uri)
+    collection = client["almayadeen_bench"]["articles"]
+    collection.drop()
+    ensure_indexes(collection)
+
+    try:
+        loaded = 0
+        for size in (int(s) for s in args.sizes.split(",")):
+            batch = [synthetic_article(post_id) for post_id in range(loaded, size)]
+            if batch:
+                collection.insert_many(batch)
+            loaded = size
+            print(f"--- {size} articles")
+            for name in SPLIT_QUERIES:
+                split_ms = time_query(SPLIT_QUERIES[name], collection, args.repeat)
+                stored_ms = time_query(STORED_QUERIES[name], collection, args.repeat)
+                print(f"{name:<32} $split {split_ms:9.1f} ms   stored {stored_ms:9.1f} ms")
+    finally:
+        client.drop_database("almayadeen_bench")
+
+
+if __name__ == "__main__":
+    main()
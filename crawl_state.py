@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+# Persistent record of crawl progress so a run can resume and skip finished URLs
+class CrawlState:
+    DONE = 'done'
+    FAILED = 'failed'
+    PENDING = 'pending'
+    SKIPPED = 'skipped'  # Fetched fine but not an article page, or unchanged since the last crawl
+    DUPLICATE = 'duplicate'  # Repeats an article already saved under another URL (dedup.py)
+
+    def __init__(self, path='./data/crawl_state.sqlite', max_attempts=3):
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sitemaps (url TEXT PRIMARY KEY, status TEXT, updated_at REAL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, sitemap TEXT, post_id TEXT, status TEXT, "
+            "error TEXT, attempts INTEGER DEFAULT 0, updated_at REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS urls_sitemap ON urls (sitemap, status)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS urls_post_id ON urls (post_id)")
+        self.db.commit()
+
+        # Finished URLs are kept in memory for O(1) skip checks during the crawl
+        self.finished_urls = set()
+        for url, status, attempts in self.db.execute("SELECT url, status, attempts FROM urls"):
+            if self.is_finished(status, attempts):
+                self.finished_urls.add(url)
+
+    def is_finished(self, status, attempts):
+        return status in (self.DONE, self.SKIPPED, self.DUPLICATE) or \
+            (status == self.FAILED and attempts >= self.max_attempts)
+
+    def is_done(self, url):
+        return url in self.finished_urls
+
+    def has_post_id(self, post_id, url):
+        # Whether this post_id was already saved from another URL. Looked up through the post_id index
+        # rather than kept in memory, since it is only asked once per parsed article.
+        with self.lock:
+            row = self.db.execute(
+                "SELECT 1 FROM urls WHERE post_id = ? AND status = ? AND url != ? LIMIT 1", (post_id, self.DONE, url)
+            ).fetchone()
+        return row is not None
+
+    def is_sitemap_done(self, sitemap_url):
+        with self.lock:
+            row = self.db.execute("SELECT status FROM sitemaps WHERE url = ?", (sitemap_url,)).fetchone()
+        return row is not None and row[0] == self.DONE
+
+    def sitemap_status(self):
+        # {sitemap url: (status, updated_at)} for every sitemap a crawl has started
+        with self.lock:
+            rows = self.db.execute("SELECT url, status, updated_at FROM sitemaps").fetchall()
+        return {url: (status, updated_at) for url, status, updated_at in rows}
+
+    def add_pending(self, sitemap_url, urls):
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR IGNORE INTO sitemaps (url, status, updated_at) VALUES (?, ?, ?)",
+                (sitemap_url, self.PENDING, now),
+            )
+            self.db.executemany(
+                "INSERT OR IGNORE INTO urls (url, sitemap, status, updated_at) VALUES (?, ?, ?, ?)",
+                [(url, sitemap_url, self.PENDING, now) for url in urls],
+            )
+            self.db.commit()
+
+    def record(self, url, status, post_id=None, error=None):
+        with self.lock:
+            self.db.execute(
+                "UPDATE urls SET status = ?, post_id = COALESCE(?, post_id), error = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE url = ?",
+                (status, post_id, error, time.time(), url),
+            )
+            attempts = self.db.execute("SELECT attempts FROM urls WHERE url = ?", (url,)).fetchone()
+            self.db.commit()
+        if self.is_finished(status, attempts[0] if attempts else 0):
+            self.finished_urls.add(url)
+
+    def mark_done(self, url, post_id):
+        self.record(url, self.DONE, post_id=post_id)
+
+    def mark_saved(self, articles):
+        # Output sink callback: these articles are on disk, so their URLs are done
+        for article in articles:
+            self.mark_done(article.url, article.post_id)
+
+    def mark_failed(self, url, error):
+        self.record(url, self.FAILED, error=error)
+
+    def mark_skipped(self, url):
+        self.record(url, self.SKIPPED)
+
+    def mark_duplicate(self, url, post_id):
+        self.record(url, self.DUPLICATE, post_id=post_id)
+
+    def finish_sitemap(self, sitemap_url):
+        # A sitemap is done once none of its URLs still need work
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT status, attempts FROM urls WHERE sitemap = ? AND status != ?", (sitemap_url, self.DONE)
+            ).fetchall()
+            if all(self.is_finished(status, attempts) for status, attempts in rows):
+                self.db.execute(
+                    "UPDATE sitemaps SET status = ?, updated_at = ? WHERE url = ?",
+                    (self.DONE, time.time(), sitemap_url),
+                )
+                self.db.commit()
+
+    def print_stats(self):
+        with self.lock:
+            counts = dict(self.db.execute("SELECT status, COUNT(*) FROM urls GROUP BY status").fetchall())
+        summary = ', '.join(f"{counts.get(status, 0)} {status}"
+                            for status in (self.DONE, self.DUPLICATE, self.SKIPPED, self.FAILED, self.PENDING))
+        print(f"Crawl state: {summary}")
+
+    def close(self):
+        self.db.close()
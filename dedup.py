@@ -0,0 +1,152 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+
+from search import tokenize
+
+FINGERPRINT_BITS = 64
+SHINGLE_WORDS = 3
+
+# What check() reports for a duplicate: 'exact' or 'near', the URL of the article it repeats and the
+# Hamming distance between their SimHashes (0 for exact copies)
+Duplicate = namedtuple("Duplicate", ["kind", "original", "distance"])
+
+
+def stable_hash(text):
+    # 64 bits that are the same in every process and run, unlike hash() under PYTHONHASHSEED
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def to_signed(value):
+    # sqlite INTEGER is signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def simhash(tokens):
+    # Charikar's SimHash over word shingles: every bit is the majority vote of that bit across the
+    # shingle hashes, so texts that share most shingles land a few bits apart. The per-bit counts are
+    # taken column by column over the hashes' binary strings, which keeps the 64-way loop in C.
+    shingles = {' '.join(tokens[i:i + SHINGLE_WORDS]) for i in range(max(len(tokens) - SHINGLE_WORDS + 1, 1))}
+    bits = [format(stable_hash(shingle), "064b") for shingle in shingles]
+    half = len(bits) / 2
+    fingerprint = 0
+    for column in zip(*bits):
+        fingerprint = (fingerprint << 1) | (column.count("1") > half)
+    return fingerprint
+
+
+class DedupIndex:
+    # Exact and near-duplicate detection over article <p> text, kept in a small sqlite table so
+    # later runs remember what earlier ones saved. Exact copies match on a hash of the normalized
+    # tokens; near duplicates (the same story re-published with an edited paragraph or two) on
+    # SimHashes at most max_distance bits apart, found through bands: split into max_distance + 1
+    # bands, two such fingerprints always agree on one whole band.
+    EXACT = 'exact'
+    NEAR = 'near'
+
+    def __init__(self, path='./data/dedup.sqlite', max_distance=3, min_tokens=30, drop_near=True):
+        self.max_distance = max_distance
+        self.min_tokens = min_tokens  # Shorter texts get no near-duplicate check; a few shared words say nothing
+        self.drop_near = drop_near  # False keeps near duplicates and only records which article they resemble
+        self.band_bits = FINGERPRINT_BITS // (max_distance + 1)
+        self.band_mask = (1 << self.band_bits) - 1
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "url TEXT PRIMARY KEY, post_id TEXT, content_hash INTEGER, simhash INTEGER, "
+            "duplicate_of TEXT, kind TEXT, distance INTEGER, seen_at REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS fingerprints_duplicate_of ON fingerprints (duplicate_of)")
+        self.db.commit()
+
+        # Originals only, in memory for lookups without a query per article
+        self.exact = {}
+        self.bands = defaultdict(list)
+        for url, content_hash, fingerprint in self.db.execute(
+                "SELECT url, content_hash, simhash FROM fingerprints WHERE duplicate_of IS NULL"):
+            self.remember(url, to_unsigned(content_hash), None if fingerprint is None else to_unsigned(fingerprint))
+
+    def band_keys(self, fingerprint):
+        return [(band, (fingerprint >> (band * self.band_bits)) & self.band_mask)
+                for band in range(self.max_distance + 1)]
+
+    def remember(self, url, content_hash, fingerprint):
+        self.exact.setdefault(content_hash, url)
+        if fingerprint is not None:
+            for key in self.band_keys(fingerprint):
+                self.bands[key].append((fingerprint, url))
+
+    def nearest(self, url, fingerprint):
+        best = None
+        for key in self.band_keys(fingerprint):
+            for candidate, candidate_url in self.bands.get(key, ()):
+                distance = (candidate ^ fingerprint).bit_count()
+                if candidate_url != url and distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, candidate_url)
+        return best
+
+    def check(self, article):
+        # Returns a Duplicate when the article should be dropped, otherwise None after indexing it.
+        # A URL seen again (a retry, or a crawl resumed before its article reached disk) is never
+        # its own duplicate.
+        tokens = tokenize(article.content)
+        if not tokens:  # Pages without paragraph text are not copies of each other
+            self.stats['unique'] += 1
+            return None
+        content_hash = stable_hash(' '.join(tokens))
+        fingerprint = simhash(tokens) if len(tokens) >= self.min_tokens else None
+
+        with self.lock:
+            original = self.exact.get(content_hash)
+            if original is not None and original != article.url:
+                duplicate = Duplicate(self.EXACT, original, 0)
+            else:
+                nearest = self.nearest(article.url, fingerprint) if fingerprint is not None and original is None \
+                    else None
+                duplicate = Duplicate(self.NEAR, nearest[1], nearest[0]) if nearest else None
+
+            self.db.execute(
+                "INSERT OR REPLACE INTO fingerprints "
+                "(url, post_id, content_hash, simhash, duplicate_of, kind, distance, seen_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (article.url, article.post_id, to_signed(content_hash),
+                 None if fingerprint is None else to_signed(fingerprint),
+                 duplicate.original if duplicate else None, duplicate.kind if duplicate else None,
+                 duplicate.distance if duplicate else None, time.time()),
+            )
+            self.db.commit()
+            if duplicate is None and original is None:
+                self.remember(article.url, content_hash, fingerprint)
+
+        if duplicate is None:
+            self.stats['unique'] += 1
+            return None
+        self.stats[duplicate.kind] += 1
+        if duplicate.kind == self.NEAR and not self.drop_near:
+            print(f"Near duplicate of {duplicate.original} ({duplicate.distance} bits), keeping: {article.url}")
+            self.stats['kept'] += 1
+            return None
+        print(f"Dropping {duplicate.kind} duplicate of {duplicate.original}: {article.url}")
+        return duplicate
+
+    def print_stats(self):
+        with self.lock:
+            originals = self.db.execute("SELECT COUNT(*) FROM fingerprints WHERE duplicate_of IS NULL").fetchone()[0]
+        kept = f", {self.stats['kept']} kept" if self.stats['kept'] else ""
+        print(f"Dedup: {self.stats['unique']} unique, {self.stats[self.EXACT]} exact and "
+              f"{self.stats[self.NEAR]} near duplicates this run{kept}; {originals} originals indexed")
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,108 @@
+import json
+import zlib
+from datetime import datetime
+
+from bson import ObjectId
+from flask import Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import parse_accept_header
+
+CHUNK_BYTES = 64 * 1024
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+
+def bson_default(value):
+    # The BSON types pymongo hands back that the json module does not know
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        # Stored dates are naive UTC (normalization.py)
+        return value.isoformat() + ("Z" if value.tzinfo is None else "")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def api_default(value):
+    # The JSON routes keep Flask's own encoding, dates as RFC 822 strings included; only ObjectIds are added.
+    # ISO 8601 dates are for the export stream alone.
+    if isinstance(value, ObjectId):
+        return str(value)
+    return DefaultJSONProvider.default(value)
+
+
+class BsonJSONProvider(DefaultJSONProvider):
+    # jsonify() for Mongo documents: ObjectIds encode directly, so routes need no str(_id) loops.
+    # Arabic text is written as UTF-8 instead of \uXXXX escapes, which are three times larger.
+    ensure_ascii = False
+    sort_keys = False
+    default = staticmethod(api_default)
+
+
+# The bytes jsonify() produces through BsonJSONProvider, for servers that do not go through Flask
+API_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=api_default)
+# One encoder for every exported document; json.dumps() with options would build a new one per call
+ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=bson_default)
+
+
+class ExportStream:
+    # Turns documents into output chunks: NDJSON lines or one JSON array, joined into ~64 KB pieces so
+    # the server is not handed tiny writes, and gzipped on the fly when asked. Push-based, so the
+    # WSGI generator below and the async cursor loop in asgi_app.py share it.
+    def __init__(self, export_format="ndjson", compress=False, chunk_bytes=CHUNK_BYTES):
+        self.ndjson = export_format == "ndjson"
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31: gzip header
+        self.chunk_bytes = chunk_bytes
+        self.buffer = []
+        self.buffered_bytes = 0
+        self.separator = "" if self.ndjson else "["
+
+    def add(self, document):
+        if self.ndjson:
+            piece = ENCODER.encode(document) + "\n"
+        else:
+            piece = self.separator + ENCODER.encode(document)
+            self.separator = ","
+        return self.write(piece.encode())
+
+    def finish(self):
+        chunks = [] if self.ndjson else self.write(b"[]" if self.separator == "[" else b"]")
+        chunks += self.flush()
+        if self.compressor is not None:
+            chunks.append(self.compressor.flush())
+        return chunks
+
+    def write(self, data):
+        self.buffer.append(data)
+        self.buffered_bytes += len(data)
+        return self.flush() if self.buffered_bytes >= self.chunk_bytes else []
+
+    def flush(self):
+        if not self.buffer:
+            return []
+        chunk = b"".join(self.buffer)
+        self.buffer = []
+        self.buffered_bytes = 0
+        if self.compressor is not None:
+            chunk = self.compressor.compress(chunk)
+        return [chunk] if chunk else []
+
+
+def accepts_gzip(accept_encoding):
+    # Honours q-values, so "gzip;q=0" refuses gzip
+    return parse_accept_header(accept_encoding or "")["gzip"] > 0
+
+
+def export_headers(compress):
+    return {"Content-Encoding": "gzip", "Vary": "Accept-Encoding"} if compress else {}
+
+
+def iter_export(documents, export_format="ndjson", compress=False):
+    stream = ExportStream(export_format, compress)
+    for document in documents:
+        yield from stream.add(document)
+    yield from stream.finish()
+
+
+def export_response(cursor, export_format="ndjson", compress=False):
+    # Streams straight from the cursor: memory stays at one batch plus one chunk however large the export
+    return Response(stream_with_context(iter_export(cursor, export_format, compress)),
+                    mimetype=EXPORT_FORMATS[export_format], headers=export_headers(compress))
@@ -0,0 +1,53 @@
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Every article page carries this marker; pages without it are skipped before any parsing happens
+METADATA_MARKER = b'tawsiyat-metadata'
+METADATA_ATTRS = {'id': 'tawsiyat-metadata', 'type': 'text/tawsiyat'}
+
+
+# Each backend returns (metadata script text or None, iterator over the <p> texts) for a downloaded page
+def extract_with_soup(content):
+    # Reference implementation: full html.parser DOM, as the scraper originally did
+    soup = BeautifulSoup(content, 'html.parser')
+    script_tag = soup.find('script', METADATA_ATTRS)
+    if not script_tag:
+        return None, iter(())
+    return script_tag.string, (p.get_text() for p in soup.find_all('p'))
+
+
+def extract_with_strainer(content):
+    # Same parser, but only <script> and <p> subtrees are built
+    soup = BeautifulSoup(content, 'html.parser', parse_only=SoupStrainer(['script', 'p']))
+    script_tag = soup.find('script', METADATA_ATTRS)
+    if not script_tag:
+        return None, iter(())
+    return script_tag.string, (p.get_text() for p in soup.find_all('p'))
+
+
+BACKENDS = {
+    'soup': extract_with_soup,
+    'strainer': extract_with_strainer,
+}
+DEFAULT_BACKEND = 'strainer'
+
+
+def assemble_content(texts):
+    # Joins the paragraphs with single spaces and counts their words on the way, one paragraph at a time,
+    # instead of splitting the finished content into a list of every word just to take its length.
+    # Splitting each paragraph gives the same count: the joining space is itself a word boundary.
+    parts = []
+    word_count = 0
+    for text in texts:
+        parts.append(text)
+        word_count += len(text.split())
+    return ' '.join(parts), word_count
+
+
+def extract(content, backend=DEFAULT_BACKEND):
+    # (metadata script text or None, joined <p> text, word count of that text)
+    if METADATA_MARKER not in content:
+        return None, '', 0
+    metadata_text, texts = BACKENDS[backend](content)
+    if metadata_text is None:
+        return None, '', 0
+    return (metadata_text, *assemble_content(texts))
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+
+# Result of a cache-aware fetch; not_modified means the body is the same as the last crawl
+FetchResult = namedtuple("FetchResult", ["content", "not_modified"])
+
+
+class HttpCache:
+    # On-disk conditional-GET cache keyed by URL, evicting least recently used bodies past max_bytes
+    def __init__(self, directory='./cache/http', max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(self.directory, 'bodies'), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, digest TEXT, size INTEGER, last_access REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self.db.commit()
+
+    def body_path(self, url):
+        return os.path.join(self.directory, 'bodies', hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+    def conditional_headers(self, url):
+        with self.lock:
+            row = self.db.execute("SELECT etag, last_modified FROM entries WHERE url = ?", (url,)).fetchone()
+        if not row or not os.path.exists(self.body_path(url)):
+            return {}
+        headers = {}
+        if row[0]:
+            headers['If-None-Match'] = row[0]
+        if row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def load(self, url, read_body=True):
+        # Body of a previous response, after the server answered 304 Not Modified
+        try:
+            if read_body:
+                with open(self.body_path(url), 'rb') as f:
+                    content = f.read()
+            elif os.path.exists(self.body_path(url)):
+                content = b''
+            else:
+                return None
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            self.db.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+            self.db.commit()
+        self.hits += 1
+        return content
+
+    def store(self, url, headers, content):
+        # Saves a full 200 response; returns True when the body matches the cached digest
+        digest = hashlib.sha256(content).hexdigest()
+        with self.lock:
+            row = self.db.execute("SELECT digest FROM entries WHERE url = ?", (url,)).fetchone()
+        unchanged = row is not None and row[0] == digest
+        if unchanged:
+            self.hits += 1
+        else:
+            self.misses += 1
+        # An unchanged body is rewritten only when its file went missing
+        if not unchanged or not os.path.exists(self.body_path(url)):
+            tmp_path = self.body_path(url) + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, self.body_path(url))
+
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries (url, etag, last_modified, digest, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, headers.get('ETag'), headers.get('Last-Modified'), digest, len(content), time.time()),
+            )
+            self.db.commit()
+        if not unchanged:
+            self.evict()
+        return unchanged
+
+    def evict(self):
+        with self.lock:
+            total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            evicted = []
+            for url, size in self.db.execute("SELECT url, size FROM entries ORDER BY last_access"):
+                if total <= self.max_bytes:
+                    break
+                evicted.append(url)
+                total -= size
+            self.db.executemany("DELETE FROM entries WHERE url = ?", [(url,) for url in evicted])
+            self.db.commit()
+        for url in evicted:
+            try:
+                os.remove(self.body_path(url))
+            except FileNotFoundError:
+                pass
+
+    def print_stats(self):
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total else 0.0
+        print(f"HTTP cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate)")
+
+    def close(self):
+        self.db.close()
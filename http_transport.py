@@ -0,0 +1,109 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+
+from http_cache import FetchResult
+
+# Responses that mean the server is shedding load
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+# Shared HTTP layer for one crawl run: pooled keep-alive connections, compression and retries.
+# Callers that pace requests themselves (CrawlPipeline's AIMD limiter) pass retry_statuses=() so
+# 429/5xx responses reach them instead of being retried here; connection errors are still retried.
+class HttpTransport:
+    def __init__(self, pool_size=10, timeout=(5, 30), retries=3, backoff_factor=0.5, cache=None,
+                 retry_statuses=RETRY_STATUSES):
+        self.timeout = timeout
+        self.cache = cache
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=retry_statuses,
+            # urllib3 retries 429/503 responses carrying Retry-After whatever the status list says
+            respect_retry_after_header=bool(retry_statuses),
+            allowed_methods=("GET", "HEAD"),
+        )
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        # gzip/deflate always, br as well when the brotli package is installed
+        self.session.headers.update(make_headers(keep_alive=True, accept_encoding=True))
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def fetch(self, url, need_unchanged_body=True):
+        # GET through the conditional cache (when configured) and report whether the body changed.
+        # Callers that skip unchanged pages pass need_unchanged_body=False to avoid reading it from disk
+        if self.cache is None:
+            response = self.get(url)
+            response.raise_for_status()  # Raise an error for HTTP issues
+            return FetchResult(response.content, False)
+
+        response = self.get(url, headers=self.cache.conditional_headers(url))
+        if response.status_code == 304:
+            content = self.cache.load(url, read_body=need_unchanged_body)
+            if content is not None:
+                return FetchResult(content, True)
+            response = self.get(url)  # Cached body vanished, fall back to a full download
+        response.raise_for_status()  # Raise an error for HTTP issues
+        unchanged = self.cache.store(url, response.headers, response.content)
+        return FetchResult(response.content, unchanged)
+
+    def stream(self, url, chunk_size=64 * 1024):
+        # Yields the body in chunks as it downloads, still going through the conditional cache
+        headers = self.cache.conditional_headers(url) if self.cache is not None else {}
+        response = self.get(url, headers=headers, stream=True)
+        if response.status_code == 304:
+            response.close()
+            content = self.cache.load(url)
+            if content is not None:
+                for start in range(0, len(content), chunk_size):
+                    yield content[start:start + chunk_size]
+                return
+            response = self.get(url, stream=True)  # Cached body vanished, fall back to a full download
+
+        chunks = []
+        with response:
+            response.raise_for_status()  # Raise an error for HTTP issues
+            for chunk in response.iter_content(chunk_size):
+                if self.cache is not None:
+                    chunks.append(chunk)
+                yield chunk
+        if self.cache is not None:
+            self.cache.store(url, response.headers, b''.join(chunks))
+
+    def stats(self):
+        requests_sent = 0
+        connections_opened = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            requests_sent += pool.num_requests
+            connections_opened += pool.num_connections
+        return {
+            "requests": requests_sent,
+            "connections_opened": connections_opened,
+            "connections_reused": max(requests_sent - connections_opened, 0),
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"HTTP: {stats['requests']} requests over {stats['connections_opened']} connections "
+              f"({stats['connections_reused']} reused)")
+        if self.cache is not None:
+            self.cache.print_stats()
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,141 @@
+import argparse
+
+import pymongo
+from pymongo import IndexModel, monitoring
+from pymongo.errors import OperationFailure
+
+from search import SEARCH_INDEX
+
+# Every index the articles collection needs, next to the routes/jobs that rely on it.
+# List routes page by (filter, _id) keysets (pagination.py), so their indexes end in _id.
+INDEXES = [
+    # /article_details/<postid>, loader upserts (unique so parallel batches cannot create duplicates)
+    IndexModel([("post_id", 1)], name="post_id_1", unique=True,
+               partialFilterExpression={"post_id": {"$type": "string"}}),
+    IndexModel([("url", 1)], name="url_1"),  # loader upserts for pages without a post_id
+    IndexModel([("keywords", 1), ("_id", 1)], name="keywords_1__id_1"),  # /articles_by_keyword/<keyword>
+    IndexModel([("author", 1), ("_id", 1)], name="author_1__id_1"),  # /articles_by_author/<author_name>
+    IndexModel([("year", 1), ("_id", 1)], name="year_1__id_1"),  # /articles_by_year/<year>
+    IndexModel([("publication_date", -1)], name="publication_date_-1"),  # recent, last X days
+    IndexModel([("publication_year", 1), ("publication_month", 1), ("publication_day", 1), ("_id", 1)],
+               name="publication_day__id"),  # /articles_by_specific_date/<date>
+    IndexModel([("classes.value", 1)], name="classes.value_1"),
+    IndexModel([("video_duration", 1)], name="video_duration_1"),  # /articles_with_video
+    # longest/shortest, more-than, ranges
+    IndexModel([("word_count", 1), ("_id", 1)], name="word_count_1__id_1"),
+    IndexModel([("title_length", 1)], name="title_length_1"),
+    IndexModel([("keyword_count", 1), ("_id", 1)], name="keyword_count_1__id_1"),  # /articles_with_keyword_count/<n>
+    IndexModel([("search_keywords", 1)], name="search_keywords_1"),  # /articles_with_keyword/<keyword>
+    SEARCH_INDEX,  # /articles_containing_text/<text>
+]
+
+def ensure_indexes(collection):
+    # Creates missing indexes one by one so a single conflict does not block the rest
+    for index in INDEXES:
+        try:
+            collection.create_indexes([index])
+        except OperationFailure as e:
+            print(f"Warning: could not create index {index.document['name']}: {e}")
+
+
+EXPLAINABLE_COMMANDS = ("find", "aggregate", "count")
+
+
+def explainable_command(event):
+    # The command as explain accepts it, without the session and wire-protocol fields the driver adds
+    return {key: value for key, value in event.command.items()
+            if not key.startswith("$") and key not in ("lsid", "txnNumber")}
+
+
+class CommandRecorder(monitoring.CommandListener):
+    # Captures the find/aggregate commands a route sends so they can be explained afterwards
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE_COMMANDS:
+            self.commands.append(explainable_command(event))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def plan_stages(node):
+    # Every stage name in the winning plans of an explain() result
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "rejectedPlans":
+                continue
+            if key == "stage":
+                yield value
+            yield from plan_stages(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from plan_stages(item)
+
+
+def sample_arguments(collection):
+    # Real values for the route placeholders so the explained queries look like production ones
+    sample = collection.find_one({"keywords.0": {"$exists": True}, "post_id": {"$type": "string"}}) or {}
+    keywords = sample.get("keywords") or ["news"]
+    published = sample.get("publication_date")
+    return {
+        "postid": sample.get("post_id", "0"),
+        "author_name": sample.get("author", "No Author"),
+        "keyword": keywords[0],
+        "year": sample.get("year", "2020"),
+        "days": 30,
+        "date": published.strftime("%Y-%m-%d") if hasattr(published, "strftime") else "2020-11-01",
+        "word_count": 1000,
+        "keyword_count": 3,
+        "text": keywords[0],
+    }
+
+
+def explain_routes():
+    # Runs against the database flask_app.py is configured for
+    recorder = CommandRecorder()
+    monitoring.register(recorder)
+    import flask_app  # Imported after registering the listener so its MongoClient reports commands
+
+    arguments = sample_arguments(flask_app.collection)
+    client = flask_app.app.test_client()
+    flagged = []
+    for rule in sorted(flask_app.app.url_map.iter_rules(), key=lambda r: r.rule):
+        if "GET" not in rule.methods or rule.endpoint == "static":
+            continue
+        path = rule.rule
+        for name in rule.arguments:
+            path = path.replace(f"<{name}>", str(arguments.get(name, ""))) \
+                       .replace(f"<int:{name}>", str(arguments.get(name, 0)))
+
+        recorder.commands = []
+        client.get(path)
+        stages = []
+        for command in recorder.commands:
+            explained = flask_app.db.command("explain", command, verbosity="queryPlanner")
+            stages.extend(plan_stages(explained))
+
+        status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+        if status == "COLLSCAN":
+            flagged.append(rule.rule)
+        print(f"{status:<9} {rule.rule:<50} {', '.join(dict.fromkeys(stages)) or 'no query'}")
+
+    print(f"{len(flagged)} routes still scan the whole collection")
+    return flagged
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Create the articles indexes or check route query plans")
+    arg_parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/", help="database to index")
+    arg_parser.add_argument("--explain", action="store_true", help="explain every route's queries and flag COLLSCANs")
+    args = arg_parser.parse_args()
+
+    if args.explain:
+        explain_routes()
+    else:
+        ensure_indexes(pymongo.MongoClient(args.mongo_uri)["almayadeen"]["articles"])
+        print("Indexes are up to date.")
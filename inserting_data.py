@@ -1,44 +1,137 @@
+import argparse
 import os
-import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
 import pymongo
+from pymongo import UpdateOne
 
-# MongoDB connection
-client = pymongo.MongoClient("mongodb://localhost:27017/")
-db = client["almayadeen"]
+from article_writer import iter_month_articles
+from indexes import ensure_indexes
+from normalization import MISSING_POST_ID, normalize_document
+from response_cache import bump_generation
+from rollups import ensure_rollup_indexes, fetch_previous, record_upserts
 
 # Base directory where all your JSON files are stored
 base_directory = r"C:\Users\user\PycharmProjects\bootcamp-project\data"
 
-# Loop through all directories (each representing a month and year)
-for dir_name in os.listdir(base_directory):
-    dir_path = os.path.join(base_directory, dir_name)
 
-    if os.path.isdir(dir_path):  # Ensure it's a directory
+def iter_documents(base_directory):
+    # Streams every article from all {year}_{month} directories, tagged with year and month
+    for dir_name in sorted(os.listdir(base_directory)):
+        dir_path = os.path.join(base_directory, dir_name)
+        if not os.path.isdir(dir_path) or dir_name.count('_') != 1:
+            continue
+
         # Extract the year and month from the directory name
         year, month = dir_name.split('_')
+        for document in iter_month_articles(dir_path):
+            document["year"] = year
+            document["month"] = month
+            yield document
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def upsert_filter(document):
+    # post_id identifies an article; pages scraped without one fall back to their URL
+    post_id = document.get("post_id")
+    if post_id and post_id != MISSING_POST_ID:
+        return {"post_id": post_id}
+    return {"url": document.get("url")}
+
+
+def upsert_batch(collection, batch):
+    # Copies of one article in a batch (the same post_id under two months) are merged the way
+    # consecutive $sets would merge them, so the rollups count the article once
+    documents = {}
+    for document in batch:
+        key = tuple(upsert_filter(document).items())
+        documents[key] = {**documents.get(key, {}), **normalize_document(document)}
+    filters = [dict(key) for key in documents]
+    # Read before writing so the rollups can subtract what re-scraped articles counted before
+    previous = fetch_previous(collection, filters)
+    operations = [UpdateOne(key, {"$set": document}, upsert=True)
+                  for key, document in zip(filters, documents.values())]
+    result = collection.bulk_write(operations, ordered=False)
+    record_upserts(collection, previous, list(documents.values()))
+    return len(batch), result.upserted_count
+
+
+def partition(document, workers):
+    # Every copy of an article goes to the same worker, whose batches run one at a time, so two
+    # batches never read and upsert the same article concurrently
+    return hash(tuple(upsert_filter(document).items())) % workers
+
+
+def load(collection, base_directory, batch_size=1000, workers=4):
+    # Includes the unique post_id index that lets parallel batches upsert without creating duplicates
+    ensure_indexes(collection)
+    ensure_rollup_indexes(collection)
+
+    loaded = 0
+    inserted = 0
+    start = time.perf_counter()
+    pools = [ThreadPoolExecutor(max_workers=1) for _ in range(workers)]
+    buffers = [[] for _ in range(workers)]
+    pending = set()
+
+    def collect(futures):
+        nonlocal loaded, inserted
+        for future in futures:
+            count, upserted = future.result()
+            loaded += count
+            inserted += upserted
+
+    try:
+        for document in iter_documents(base_directory):
+            worker = partition(document, workers)
+            buffers[worker].append(document)
+            if len(buffers[worker]) < batch_size:
+                continue
+            # Keep at most two batches per worker in memory
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+                print_progress(loaded, inserted, start)
+            pending.add(pools[worker].submit(upsert_batch, collection, buffers[worker]))
+            buffers[worker] = []
 
-        # Loop through all JSON files in the directory
-        for filename in os.listdir(dir_path):
-            if filename.endswith(".json"):
-                file_path = os.path.join(dir_path, filename)
+        for worker, batch in enumerate(buffers):
+            if batch:
+                pending.add(pools[worker].submit(upsert_batch, collection, batch))
+        collect(pending)
+    finally:
+        for pool in pools:
+            pool.shutdown()
+    print_progress(loaded, inserted, start)
+    # Cached API responses are now stale
+    bump_generation(collection.database)
+    return loaded, inserted
 
-                # Read the JSON file
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
 
-                    # Ensure data is a list of documents (array of JSON objects)
-                    if isinstance(data, dict):  # If it's a single document, convert it to a list
-                        data = [data]
+def print_progress(loaded, inserted, start):
+    elapsed = time.perf_counter() - start
+    rate = loaded / elapsed if elapsed else 0.0
+    print(f"Loaded {loaded} documents ({inserted} new, {loaded - inserted} updated) at {rate:.0f} docs/sec")
 
-                    # Add metadata (year and month) to each document
-                    for document in data:
-                        document["year"] = year
-                        document["month"] = month
 
-                    # Insert data into MongoDB
-                    collection = db["articles"]
-                    collection.insert_many(data)
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Load scraped articles into MongoDB")
+    arg_parser.add_argument("--data-dir", default=base_directory)
+    arg_parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    arg_parser.add_argument("--batch-size", type=int, default=1000)
+    arg_parser.add_argument("--workers", type=int, default=4)
+    args = arg_parser.parse_args()
 
-                print(f"Inserted data from {file_path} into MongoDB.")
+    # MongoDB connection
+    client = pymongo.MongoClient(args.mongo_uri, maxPoolSize=max(args.workers * 2, 10))
+    db = client["almayadeen"]
 
-print("All data inserted successfully!")
\ No newline at end of file
+    load(db["articles"], args.data_dir, args.batch_size, args.workers)
+    print("All data inserted successfully!")
@@ -0,0 +1,231 @@
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from flask import Response, g, jsonify, request
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+from indexes import EXPLAINABLE_COMMANDS, explainable_command
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_RECORDED_COMMANDS = 20
+
+# The request whose thread (or asyncio task) is issuing Mongo commands right now
+current_request = ContextVar("current_request", default=None)
+
+
+class RequestRecord:
+    def __init__(self, endpoint, path):
+        self.endpoint = endpoint
+        self.path = path
+        self.started = time.perf_counter()
+        self.thread_id = threading.get_ident()
+        self.mongo_seconds = 0.0
+        self.mongo_commands = 0
+        self.documents_returned = 0
+        self.commands = []  # Explainable commands, re-run with explain when the request turns out slow
+        self.samples = Counter()  # Stack samples taken by the SamplingProfiler
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    # Charges each command's server round trip and returned documents to the request that sent it
+    def started(self, event):
+        record = current_request.get()
+        if record is not None and event.command_name in EXPLAINABLE_COMMANDS \
+                and len(record.commands) < MAX_RECORDED_COMMANDS:
+            record.commands.append(explainable_command(event))
+
+    def succeeded(self, event):
+        record = current_request.get()
+        if record is None:
+            return
+        record.mongo_seconds += event.duration_micros / 1e6
+        record.mongo_commands += 1
+        cursor = event.reply.get("cursor") if isinstance(event.reply, dict) else None
+        if cursor:
+            record.documents_returned += len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+
+    def failed(self, event):
+        record = current_request.get()
+        if record is not None:
+            record.mongo_seconds += event.duration_micros / 1e6
+            record.mongo_commands += 1
+
+
+def total_docs_examined(node):
+    # Sums totalDocsExamined over every executionStats section of an explain() result
+    if isinstance(node, dict):
+        return node.get("totalDocsExamined", 0) + sum(total_docs_examined(value) for key, value in node.items()
+                                                      if key != "totalDocsExamined")
+    if isinstance(node, list):
+        return sum(total_docs_examined(item) for item in node)
+    return 0
+
+
+class SamplingProfiler:
+    # One background thread that samples the stacks of requests running longer than the threshold,
+    # so fast requests cost nothing beyond registering themselves in `in_flight`
+    def __init__(self, threshold=1.0, interval=0.005, depth=12):
+        self.threshold = threshold
+        self.interval = interval
+        self.depth = depth
+        self.in_flight = {}  # thread id -> RequestRecord
+        self.thread = threading.Thread(target=self.run, name="request-profiler", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            slow = [record for record in list(self.in_flight.values()) if now - record.started >= self.threshold]
+            if not slow:
+                continue
+            frames = sys._current_frames()
+            for record in slow:
+                frame = frames.get(record.thread_id)
+                if frame is not None:
+                    record.samples[self.stack(frame)] += 1
+
+    def stack(self, frame):
+        # Collapsed stack, outermost call first: "module:function:line;..."
+        entries = []
+        while frame is not None and len(entries) < self.depth:
+            code = frame.f_code
+            entries.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return ";".join(reversed(entries))
+
+
+class Instrumentation:
+    # Per-route wall time, Mongo time, documents and response bytes for flask_app.py, exposed at
+    # /metrics (Prometheus text format) and /debug/slow (the slowest recent requests, with explain
+    # figures and profiler samples)
+    def __init__(self, slow_threshold=0.5, profile_threshold=None, explain_interval=60.0, slow_log_size=100):
+        self.listener = MongoCommandTimer()  # Pass to MongoClient(event_listeners=[...])
+        self.slow_threshold = slow_threshold
+        self.explain_interval = explain_interval
+        self.profiler = SamplingProfiler(profile_threshold) if profile_threshold is not None else None
+        self.db = None
+
+        self.lock = threading.Lock()
+        self.routes = defaultdict(lambda: {"count": 0, "seconds": 0.0, "mongo_seconds": 0.0, "mongo_commands": 0,
+                                           "response_bytes": 0, "documents_returned": 0, "documents_examined": 0,
+                                           "buckets": [0] * len(LATENCY_BUCKETS)})
+        self.slow_requests = deque(maxlen=slow_log_size)
+        self.explained_at = {}
+        self.explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-explain")
+
+    def init_app(self, app, db):
+        # Register before other before_request hooks (the response cache) so cache hits are timed too
+        self.db = db
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics)
+        app.add_url_rule('/debug/slow', 'debug_slow', lambda: jsonify(list(reversed(self.slow_requests))))
+
+    def before_request(self):
+        record = RequestRecord(request.endpoint or "unmatched", request.full_path.rstrip("?"))
+        g.instrumentation_token = current_request.set(record)
+        if self.profiler is not None:
+            self.profiler.in_flight[record.thread_id] = record
+
+    def after_request(self, response):
+        record = current_request.get()
+        if record is None:
+            return response
+        seconds = time.perf_counter() - record.started
+        # Streamed responses (exports) have no length up front and are not counted
+        response_bytes = response.calculate_content_length() or 0
+
+        with self.lock:
+            route = self.routes[record.endpoint]
+            route["count"] += 1
+            route["seconds"] += seconds
+            route["mongo_seconds"] += record.mongo_seconds
+            route["mongo_commands"] += record.mongo_commands
+            route["response_bytes"] += response_bytes
+            route["documents_returned"] += record.documents_returned
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    route["buckets"][i] += 1
+
+        if seconds >= self.slow_threshold:
+            self.record_slow(record, seconds, response_bytes, response.status_code)
+        return response
+
+    def teardown_request(self, exception=None):
+        token = g.pop("instrumentation_token", None)
+        if token is not None:
+            if self.profiler is not None:
+                self.profiler.in_flight.pop(token.var.get().thread_id, None)
+            current_request.reset(token)
+
+    def record_slow(self, record, seconds, response_bytes, status_code):
+        entry = {
+            "endpoint": record.endpoint,
+            "path": record.path,
+            "status": status_code,
+            "wall_ms": round(seconds * 1000, 1),
+            "mongo_ms": round(record.mongo_seconds * 1000, 1),
+            "mongo_commands": record.mongo_commands,
+            "response_bytes": response_bytes,
+            "documents_returned": record.documents_returned,
+            "documents_examined": None,  # Filled in by explain, at most once per route per explain_interval
+            "profile": [{"stack": stack, "samples": count} for stack, count in record.samples.most_common(10)],
+        }
+        self.slow_requests.append(entry)
+
+        now = time.monotonic()
+        if record.commands and self.db is not None \
+                and now - self.explained_at.get(record.endpoint, -self.explain_interval) >= self.explain_interval:
+            self.explained_at[record.endpoint] = now
+            self.explainer.submit(self.explain, entry, record.commands)
+
+    def explain(self, entry, commands):
+        # Off the request thread: re-runs the request's queries with executionStats
+        examined = 0
+        try:
+            for command in commands:
+                examined += total_docs_examined(self.db.command("explain", command, verbosity="executionStats"))
+        except PyMongoError as e:
+            print(f"Warning: could not explain {entry['endpoint']}: {e}")
+            return
+        entry["documents_examined"] = examined
+        with self.lock:
+            self.routes[entry["endpoint"]]["documents_examined"] = examined
+
+    def metrics(self):
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            routes = sorted(self.routes.items())
+            family("api_request_duration_seconds", "histogram", "Wall time per request by route")
+            for endpoint, route in routes:
+                for bound, count in zip(LATENCY_BUCKETS, route["buckets"]):
+                    lines.append(f'api_request_duration_seconds_bucket{{route="{endpoint}",le="{bound}"}} {count}')
+                lines.append(f'api_request_duration_seconds_bucket{{route="{endpoint}",le="+Inf"}} {route["count"]}')
+                lines.append(f'api_request_duration_seconds_sum{{route="{endpoint}"}} {route["seconds"]:.6f}')
+                lines.append(f'api_request_duration_seconds_count{{route="{endpoint}"}} {route["count"]}')
+            for name, key, kind, help_text in (
+                    ("api_mongo_seconds_total", "mongo_seconds", "counter", "Time spent in MongoDB commands"),
+                    ("api_mongo_commands_total", "mongo_commands", "counter", "MongoDB commands sent"),
+                    ("api_response_bytes_total", "response_bytes", "counter", "Response body bytes"),
+                    ("api_documents_returned_total", "documents_returned", "counter",
+                     "Documents MongoDB returned to the app"),
+                    ("api_documents_examined", "documents_examined", "gauge",
+                     "Documents examined by the route's queries in the last explained slow request")):
+                family(name, kind, help_text)
+                for endpoint, route in routes:
+                    value = route[key]
+                    lines.append(f'{name}{{route="{endpoint}"}} {value:.6f}' if isinstance(value, float)
+                                 else f'{name}{{route="{endpoint}"}} {value}')
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
@@ -1,13 +1,28 @@
-import requests
-from bs4 import BeautifulSoup
 import json
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
 import os
 import re
+import sys
 from datetime import datetime
 
+from crawl_state import CrawlState
+from dedup import DedupIndex
+from extraction import BACKENDS, DEFAULT_BACKEND, extract
+from http_cache import HttpCache
+from http_transport import HttpTransport
+from scheduler import DEFAULT_RANGES, NEWEST_FIRST, POLICIES, SitemapScheduler, parse_ranges
+from sitemap_stream import iter_sitemap_entries
 
-@dataclass
+SITE_URL = "https://www.almayadeen.net"
+MISSING_POST_ID = 'No Post ID'
+
+
+def intern_value(value):
+    # Only exact str can be interned; metadata may hold numbers, None or nested values
+    return sys.intern(value) if type(value) is str else value
+
+
+@dataclass(slots=True)
 class Article:
     url: str
     post_id: str
@@ -22,18 +37,45 @@ class Article:
     word_count: int
     classes: list  # Added to store classes metadata
 
+    def __post_init__(self):
+        # Authors, keywords and class labels repeat across thousands of articles; interned, every article
+        # shares one copy of each instead of holding its own from json.loads
+        self.author = intern_value(self.author)
+        if isinstance(self.keywords, list):
+            self.keywords = [intern_value(keyword) for keyword in self.keywords]
+        if isinstance(self.classes, list):
+            self.classes = [{intern_value(key): intern_value(value) for key, value in item.items()}
+                            if isinstance(item, dict) else item for item in self.classes]
+
+    def __reduce__(self):
+        # Rebuilt through __init__ when unpickled, so articles parsed in pipeline.py's worker processes
+        # are interned again in the writer process
+        return Article, self.values()
+
+    def values(self):
+        return tuple(getattr(self, name) for name in ARTICLE_FIELDS)
+
+    def to_dict(self):
+        # Shallow, unlike asdict(), which deep-copies every list and dict just to serialize them
+        return dict(zip(ARTICLE_FIELDS, self.values()))
+
+
+ARTICLE_FIELDS = tuple(field.name for field in fields(Article))
+
 
 class SitemapParser:
-    def __init__(self):
+    def __init__(self, transport=None, base_url=SITE_URL):
         self.current_date = datetime.now()
+        self.transport = transport or HttpTransport()
+        self.base_url = base_url.rstrip('/')  # Another host serving the same layout, e.g. mock_site.py
 
-    def generate_sitemap_urls(self):
+    def generate_sitemap_urls(self, newest=(2020, 11), oldest=(2011, 1)):
+        # Monthly sitemaps from newest back to oldest, both (year, month) and inclusive
         sitemap_urls = []
-        year = 2020
-        month =11
+        year, month = newest
 
-        while year > 2010:  # Arbitrary cutoff year to stop
-            sitemap_url = f"https://www.almayadeen.net/sitemaps/all/sitemap-{year}-{month:02}.xml"
+        while (year, month) >= oldest:
+            sitemap_url = f"{self.base_url}/sitemaps/all/sitemap-{year}-{month:02}.xml"
             sitemap_urls.append(sitemap_url)
 
             # Move to the previous month
@@ -44,13 +86,19 @@ class SitemapParser:
 
         return sitemap_urls
 
+    def iter_article_urls(self, sitemap_url):
+        # Streams article URLs while the sitemap downloads; sitemap index files are followed recursively.
+        # An unchanged sitemap still has to be parsed for its URLs; its articles revalidate on their own
+        print(f"Fetching sitemap: {sitemap_url}")
+        for kind, loc in iter_sitemap_entries(self.transport.stream(sitemap_url)):
+            if kind == 'sitemap':
+                yield from self.iter_article_urls(loc)
+            else:
+                yield loc
+
     def get_article_urls(self, sitemap_url):
         try:
-            print(f"Fetching sitemap: {sitemap_url}")
-            response = requests.get(sitemap_url)
-            response.raise_for_status()  # Raise an error for HTTP issues
-            soup = BeautifulSoup(response.content, 'xml')
-            urls = [loc.text for loc in soup.find_all('loc')]
+            urls = list(self.iter_article_urls(sitemap_url))
             print(f"Found {len(urls)} articles in sitemap.")
             return urls
         except Exception as e:
@@ -59,56 +107,65 @@ class SitemapParser:
 
 
 class ArticleScraper:
-    def __init__(self, url):
+    def __init__(self, url, transport=None, backend=DEFAULT_BACKEND, skip_unchanged=True):
         self.url = url
+        self.transport = transport
+        self.backend = backend
+        # Skip pages the cache reports as unchanged. Crawls that track progress in CrawlState turn this off:
+        # a URL they still have to scrape may be cached without its article ever having been saved.
+        self.skip_unchanged = skip_unchanged
+        self.error = None  # Set when scrape() fails, as opposed to skipping a non-article page
 
     def scrape(self):
         try:
             print(f"Scraping article: {self.url}")
-            response = requests.get(self.url)
-            response.raise_for_status()  # Raise an error for HTTP issues
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            # Ensure the page contains the "tawsiyat-metadata" script
-            script_tag = soup.find('script', {'id': 'tawsiyat-metadata', 'type': 'text/tawsiyat'})
-            if not script_tag:
-                print(f"Skipping non-article page (no 'tawsiyat' metadata): {self.url}")
+            if self.transport is None:  # Standalone use; main() shares one transport across articles
+                self.transport = HttpTransport()
+            result = self.transport.fetch(self.url, need_unchanged_body=not self.skip_unchanged)
+            if result.not_modified and self.skip_unchanged:
+                print(f"Skipping unchanged article since last crawl: {self.url}")
                 return None
-
-            try:
-                metadata = json.loads(script_tag.string)
-            except json.JSONDecodeError as e:
-                print(f"Warning: Failed to parse JSON-LD for article {self.url}. Error: {e}")
-                return None
-
-            # Extract main article content from <p> tags
-            content = ' '.join([p.get_text() for p in soup.find_all('p')])
-            word_count = len(content.split())
-
-            return Article(
-                url=self.url,
-                post_id=metadata.get('postid', 'No Post ID'),
-                title=metadata.get('title', 'No Title'),
-                keywords=metadata.get('keywords', []),
-                thumbnail=metadata.get('thumbnail', 'No Thumbnail'),
-                publication_date=metadata.get('published_time', 'No Date'),
-                last_updated_date=metadata.get('last_updated', 'No Date'),
-                author=metadata.get('author', 'No Author'),
-                content=content,
-                video_duration=metadata.get('video_duration', None),
-                word_count=word_count,
-                classes=metadata.get('classes', [])  # Extracting classes metadata
-            )
+            return self.parse(result.content)
         except Exception as e:
             print(f"Error scraping article {self.url}: {e}")
+            self.error = str(e)
             return None
 
+    def parse(self, content):
+        # Build an Article from a downloaded page (shared by the sequential and async crawlers)
+        # The extraction backend pulls out the "tawsiyat-metadata" script and the <p> text
+        metadata_text, content, word_count = extract(content, self.backend)
+        if metadata_text is None:
+            print(f"Skipping non-article page (no 'tawsiyat' metadata): {self.url}")
+            return None
+
+        try:
+            metadata = json.loads(metadata_text)
+        except json.JSONDecodeError as e:
+            print(f"Warning: Failed to parse JSON-LD for article {self.url}. Error: {e}")
+            return None
+
+        return Article(
+            url=self.url,
+            post_id=metadata.get('postid', MISSING_POST_ID),
+            title=metadata.get('title', 'No Title'),
+            keywords=metadata.get('keywords', []),
+            thumbnail=metadata.get('thumbnail', 'No Thumbnail'),
+            publication_date=metadata.get('published_time', 'No Date'),
+            last_updated_date=metadata.get('last_updated', 'No Date'),
+            author=metadata.get('author', 'No Author'),
+            content=content,
+            video_duration=metadata.get('video_duration', None),
+            word_count=word_count,
+            classes=metadata.get('classes', [])  # Extracting classes metadata
+        )
+
 
 class FileUtility:
-    def __init__(self, year, month):
+    def __init__(self, year, month, base_directory='./data'):
         self.year = year
         self.month = month
-        self.directory = f'./data/{self.year}_{self.month}'
+        self.directory = f'{base_directory}/{self.year}_{self.month}'
         os.makedirs(self.directory, exist_ok=True)
 
     def sanitize_filename(self, name):
@@ -122,41 +179,68 @@ class FileUtility:
         sanitized_post_id = self.sanitize_filename(article.post_id)
         filename = f'{self.directory}/article_{sanitized_post_id}.json'
         with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(asdict(article), f, ensure_ascii=False, indent=4)
+            json.dump(article.to_dict(), f, ensure_ascii=False, indent=4)
         print(f"Saved article to {filename}")
 
 
-def main():
-    max_articles = 2000
+def is_saved_post(state, article):
+    # The same post under a second URL (e.g. listed in two sitemaps), even if its text changed since
+    return article.post_id != MISSING_POST_ID and state.has_post_id(article.post_id, article.url)
+
+
+def main(backend=DEFAULT_BACKEND, output='jsonl', max_articles=2000, base_url=SITE_URL, ranges=DEFAULT_RANGES,
+         policy=NEWEST_FIRST, recrawl_after=None):
+    from article_writer import open_sink
+
     total_articles = 0
-    parser = SitemapParser()
-    sitemap_urls = parser.generate_sitemap_urls()
+    transport = HttpTransport(cache=HttpCache())
+    state = CrawlState()
+    dedup = DedupIndex()
+    sink = open_sink(output, on_saved=state.mark_saved)
+    parser = SitemapParser(transport, base_url)
+    scheduler = SitemapScheduler(parser, state, ranges, policy, recrawl_after)
 
     try:
-        # Process each monthly sitemap
-        for sitemap_url in sitemap_urls:
+        # Process each monthly sitemap, in the scheduler's order
+        for sitemap_url in scheduler.sitemap_urls():
             print(f"Processing sitemap: {sitemap_url}")
             year, month = sitemap_url.split('-')[-2], sitemap_url.split('-')[-1].replace('.xml', '')
-            article_urls = parser.get_article_urls(sitemap_url)
+            found_urls = 0
+            try:
+                # Scraping starts as soon as the first <loc> arrives, before the sitemap finishes downloading
+                for url in parser.iter_article_urls(sitemap_url):
+                    found_urls += 1
+                    if total_articles >= max_articles:
+                        break
+                    state.add_pending(sitemap_url, [url])
+                    if state.is_done(url):  # Already scraped by an earlier run
+                        continue
+                    scraper = ArticleScraper(url, transport, backend, skip_unchanged=False)
+                    article = scraper.scrape()
+                    # Already saved under another URL: the same post_id, or the same or nearly the same text
+                    if article and (is_saved_post(state, article) or dedup.check(article)):
+                        state.mark_duplicate(url, article.post_id)
+                    elif article:  # Only save valid articles
+                        sink.write(year, month, article)  # Marked done in the state once it is on disk
+                        total_articles += 1
+                        print(f"Processed article {total_articles}/{max_articles}")
+                    elif scraper.error:
+                        state.mark_failed(url, scraper.error)
+                    else:
+                        state.mark_skipped(url)
+                else:
+                    # Only a fully read sitemap can be marked as finished
+                    sink.flush()
+                    state.finish_sitemap(sitemap_url)
+            except Exception as e:
+                print(f"Error fetching sitemap {sitemap_url}: {e}")
+                continue
 
-            if not article_urls:
+            if not found_urls:
                 print("No articles found.")
                 continue
 
-            print(f"Found {len(article_urls)} articles.")
-
-            file_utility = FileUtility(year, month)
-            for url in article_urls:
-                if total_articles >= max_articles:
-                    break
-                scraper = ArticleScraper(url)
-                article = scraper.scrape()
-                if article:  # Only save valid articles
-                    file_utility.save_article(article)
-                    total_articles += 1
-                    print(f"Processed article {total_articles}/{max_articles}")
-
-            print(f"Processed {len(article_urls)} articles for {year}-{month}. Total so far: {total_articles}")
+            print(f"Processed {found_urls} articles for {year}-{month}. Total so far: {total_articles}")
 
             if total_articles >= max_articles:
                 print(f"Reached {max_articles} articles. Stopping.")
@@ -164,7 +248,55 @@ def main():
 
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        sink.close()
+        transport.print_stats()
+        transport.close()
+        state.print_stats()
+        state.close()
+        dedup.print_stats()
+        dedup.close()
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Scrape almayadeen articles from the monthly sitemaps")
+    arg_parser.add_argument("--engine", choices=["sequential", "async", "pipeline"], default="sequential",
+                            help="sequential keeps the original one-by-one crawl, async fetches concurrently, "
+                                 "pipeline also parses in a process pool")
+    arg_parser.add_argument("--output", choices=["jsonl", "files"], default="jsonl",
+                            help="jsonl appends to compressed segments per month, files writes one JSON per article")
+    arg_parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                            help="HTML extraction backend (strainer builds only the <script> and <p> subtrees)")
+    arg_parser.add_argument("--max-articles", type=int, default=2000)
+    arg_parser.add_argument("--base-url", default=SITE_URL,
+                            help="site to crawl; point it at mock_site.py to run without network access")
+    arg_parser.add_argument("--months", type=parse_ranges, default=DEFAULT_RANGES,
+                            help="sitemap months to crawl, e.g. 2019-01:2020-11,2015-06 (default 2011-01:2020-11)")
+    arg_parser.add_argument("--policy", choices=POLICIES, default=NEWEST_FIRST,
+                            help="sitemap order: newest or oldest month first, or least recently crawled first")
+    arg_parser.add_argument("--recrawl-after-days", type=float,
+                            help="visit finished sitemaps again once this many days have passed")
+    arg_parser.add_argument("--max-in-flight", type=int,
+                            help="concurrent article fetches for the async and pipeline engines "
+                                 "(default 20 and 16)")
+    arg_parser.add_argument("--host-rate", type=float, default=10.0,
+                            help="average requests per second to one host for the async engine")
+    args = arg_parser.parse_args()
+
+    schedule = {"ranges": args.months, "policy": args.policy,
+                "recrawl_after": args.recrawl_after_days * 86400 if args.recrawl_after_days is not None else None}
+    if args.engine == "async":
+        import asyncio
+        from async_crawler import main_async
+        concurrency = {"max_in_flight": args.max_in_flight} if args.max_in_flight else {}
+        asyncio.run(main_async(max_articles=args.max_articles, host_rate=args.host_rate, backend=args.backend,
+                               output=args.output, base_url=args.base_url, **concurrency, **schedule))
+    elif args.engine == "pipeline":
+        from pipeline import main_pipeline
+        concurrency = {"fetch_workers": args.max_in_flight} if args.max_in_flight else {}
+        main_pipeline(max_articles=args.max_articles, backend=args.backend, output=args.output,
+                      base_url=args.base_url, **concurrency, **schedule)
+    else:
+        main(args.backend, args.output, args.max_articles, args.base_url, **schedule)
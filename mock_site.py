@@ -0,0 +1,176 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Local stand-in for almayadeen.net so the crawlers can be measured without network access
+def render_chrome(links):
+    # Navigation, related-article and footer markup that real pages carry around the article body
+    items = "".join(f'<li class="menu-item"><a href="/section/{i}"><span>Section {i}</span></a></li>'
+                    for i in range(links))
+    return f'<header><nav><ul class="menu">{items}</ul></nav></header>', f'<footer><div class="links">{items}</div></footer>'
+
+
+# Body text is drawn from this vocabulary, seeded by post id, so distinct articles do not share their wording
+SYLLABLES = ["al", "ma", "ya", "din", "sa", "lam", "qa", "ra", "bi", "ta", "nu", "ha", "ka", "fi", "zu", "wa"]
+VOCABULARY = [first + second for first in SYLLABLES for second in SYLLABLES]
+
+
+def render_article(post_id, paragraphs=8, chrome_links=150, updated=False):
+    # updated adds a closing line, as when a story is republished under another URL with an update
+    metadata = {
+        "postid": str(post_id),
+        "title": f"Article {post_id}",
+        "keywords": ["news", f"topic-{post_id % 10}"],
+        "thumbnail": f"/images/{post_id}.jpg",
+        "published_time": "2020-11-01T10:00:00+03:00",
+        "last_updated": "2020-11-02T10:00:00+03:00",
+        "author": f"Author {post_id % 5}",
+        "classes": [{"key": "coverage", "value": "local"}],
+    }
+    words = random.Random(post_id)
+    body = "".join(f"<p>{' '.join(words.choices(VOCABULARY, k=12))}.</p>" for _ in range(paragraphs))
+    if updated:
+        body += "<p>Updated with new details.</p>"
+    header, footer = render_chrome(chrome_links)
+    return (
+        "<html><head>"
+        f'<script id="tawsiyat-metadata" type="text/tawsiyat">{json.dumps(metadata)}</script>'
+        f'</head><body>{header}<main><article>{body}</article></main>{footer}</body></html>'
+    ).encode("utf-8")
+
+
+def render_sitemap(base_url, article_ids):
+    locs = "".join(f"<url><loc>{base_url}/article/{post_id}</loc></url>" for post_id in article_ids)
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</urlset>'
+    ).encode("utf-8")
+
+
+class MockSiteHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    latency_jitter = 0.0  # Extra uniform delay of up to this many seconds per request
+    error_rate = 0.0  # Fraction of article requests answered with error_status
+    error_status = 503
+    retry_after = None  # Retry-After seconds sent with error responses
+    duplicate_rate = 0.0  # Fraction of article URLs repeating the previous article, half of them with an update
+    paragraphs = 8
+    chrome_links = 150
+    articles_per_sitemap = 100
+
+    def do_GET(self):
+        delay = self.latency + (random.uniform(0, self.latency_jitter) if self.latency_jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+        if self.path.startswith("/article/"):
+            post_id = int(self.path.rsplit("/", 1)[-1])
+            if self.error_rate and random.random() < self.error_rate:
+                self.server.count("errors")
+                self.send_response(self.error_status)
+                if self.retry_after is not None:
+                    self.send_header("Retry-After", str(self.retry_after))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            source, updated = self.article_source(post_id)
+            body = render_article(source, self.paragraphs, self.chrome_links, updated)
+            self.server.count("articles", len(body))
+            self.send_body(body, "text/html; charset=utf-8")
+        elif self.path.startswith("/sitemaps/all/sitemap-"):
+            start = self.sitemap_offset(self.path)
+            ids = range(start, start + self.articles_per_sitemap)
+            body = render_sitemap(self.server.base_url, ids)
+            self.server.count("sitemaps", len(body))
+            self.send_body(body, "application/xml")
+        else:
+            self.send_error(404)
+
+    def article_source(self, post_id):
+        # (post id whose story this URL serves, whether it is an updated copy); fixed per URL across requests
+        draw = random.Random(-post_id - 1).random()
+        if draw < self.duplicate_rate:
+            return post_id - 1, draw < self.duplicate_rate / 2
+        return post_id, False
+
+    def sitemap_offset(self, path):
+        # sitemap-YYYY-MM.xml -> a distinct block of article ids per month
+        year, month = path.rsplit("sitemap-", 1)[-1].replace(".xml", "").split("-")[:2]
+        return (int(year) * 12 + int(month)) * self.articles_per_sitemap
+
+    def send_body(self, body, content_type):
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockSiteServer(ThreadingHTTPServer):
+    request_queue_size = 128
+
+    def __init__(self, address, handler):
+        super().__init__(address, handler)
+        self.lock = threading.Lock()
+        self.stats = {"articles": 0, "sitemaps": 0, "errors": 0, "bytes": 0}
+
+    def count(self, kind, size=0):
+        with self.lock:
+            self.stats[kind] += 1
+            self.stats["bytes"] += size
+
+
+def start_mock_site(latency=0.0, port=0, latency_jitter=0.0, error_rate=0.0, error_status=503, paragraphs=8,
+                    chrome_links=150, articles_per_sitemap=100, duplicate_rate=0.0, retry_after=None):
+    # paragraphs and chrome_links set the page size: ~55 bytes per paragraph, ~150 bytes per chrome link
+    handler = type("ConfiguredMockSiteHandler", (MockSiteHandler,), {
+        "latency": latency,
+        "latency_jitter": latency_jitter,
+        "error_rate": error_rate,
+        "error_status": error_status,
+        "retry_after": retry_after,
+        "paragraphs": paragraphs,
+        "chrome_links": chrome_links,
+        "articles_per_sitemap": articles_per_sitemap,
+        "duplicate_rate": duplicate_rate,
+    })
+    server = MockSiteServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Serve a local stand-in for almayadeen.net")
+    arg_parser.add_argument("--port", type=int, default=8000)
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    arg_parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of article requests that fail")
+    arg_parser.add_argument("--paragraphs", type=int, default=8)
+    args = arg_parser.parse_args()
+
+    site = start_mock_site(latency=args.latency, port=args.port, error_rate=args.error_rate,
+                           paragraphs=args.paragraphs)
+    print(f"Mock site running at {site.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        site.shutdown()
@@ -0,0 +1,111 @@
+import argparse
+from datetime import datetime, timezone
+
+import pymongo
+from pymongo import UpdateOne
+
+from indexes import ensure_indexes
+from rollups import rebuild_rollups
+from search import search_fields
+
+DATE_FIELDS = ("publication_date", "last_updated_date")
+COUNT_FIELDS = ("word_count", "title_length", "keyword_count")  # Indexed in indexes.py
+# What the scraper writes for pages without a post id; stored as null so the unique post_id index,
+# which only covers strings, never sees two of them
+MISSING_POST_ID = 'No Post ID'
+DATE_FORMATS = ("%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+
+def parse_date(value):
+    # The site publishes ISO 8601 timestamps, with and without milliseconds
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str) or not value or value == 'No Date':
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        pass
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def to_stored_date(value):
+    # MongoDB keeps dates in UTC; aware datetimes are converted so the derived fields agree with it
+    parsed = parse_date(value)
+    if parsed is not None and parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def normalize_document(document):
+    # Stores real dates plus precomputed (UTC) year/month/day so read endpoints never convert data
+    if document.get("post_id") == MISSING_POST_ID:
+        document["post_id"] = None
+    for field in DATE_FIELDS:
+        parsed = to_stored_date(document.get(field))
+        if parsed is not None:
+            document[field] = parsed
+
+    published = document.get("publication_date")
+    if isinstance(published, datetime):
+        document["publication_year"] = published.year
+        document["publication_month"] = published.month
+        document["publication_day"] = published.day
+
+    # Numeric fields the length/size endpoints sort and filter on through indexes
+    if not isinstance(document.get("word_count"), int) and isinstance(document.get("content"), str):
+        document["word_count"] = len(document["content"].split())
+    if isinstance(document.get("title"), str):
+        document["title_length"] = len(document["title"].split())
+    if isinstance(document.get("keywords"), list):
+        document["keyword_count"] = len(document["keywords"])
+
+    # Normalized Arabic tokens for the text index
+    if "content" in document or "title" in document:
+        document.update(search_fields(document))
+    return document
+
+
+def migrate(collection, batch_size=1000):
+    # One-time pass over documents loaded before normalization existed
+    query = {"$or": [
+        {"publication_date": {"$type": "string"}},
+        {"last_updated_date": {"$type": "string"}},
+        {"publication_year": {"$exists": False}},
+        {"post_id": MISSING_POST_ID},
+    ] + [{field: {"$exists": False}} for field in COUNT_FIELDS + ("search_text",)]}
+    projection = {field: 1 for field in DATE_FIELDS + ("post_id", "word_count", "content", "title", "keywords")}
+    operations = []
+    migrated = 0
+    for document in collection.find(query, projection):
+        changes = normalize_document(dict(document))
+        for field in ("_id", "content", "title", "keywords"):
+            changes.pop(field, None)
+        operations.append(UpdateOne({"_id": document["_id"]}, {"$set": changes}))
+        if len(operations) >= batch_size:
+            collection.bulk_write(operations, ordered=False)
+            migrated += len(operations)
+            operations = []
+            print(f"Normalized {migrated} documents")
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+        migrated += len(operations)
+    print(f"Normalized {migrated} documents in total")
+    ensure_indexes(collection)
+    # Day counts depend on the converted dates
+    rebuild_rollups(collection)
+    return migrated
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Normalize dates and derived fields of stored articles")
+    arg_parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    args = arg_parser.parse_args()
+
+    client = pymongo.MongoClient(args.mongo_uri)
+    migrate(client["almayadeen"]["articles"])
@@ -0,0 +1,107 @@
+import base64
+from datetime import datetime
+
+from bson import ObjectId, json_util
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Fields a caller may ask for with ?fields=title,url,...
+ARTICLE_FIELDS = ("_id", "post_id", "url", "title", "author", "keywords", "classes", "description",
+                  "content", "lang", "thumbnail", "video_duration", "publication_date", "last_updated_date",
+                  "year", "month", "word_count", "title_length", "keyword_count")
+
+# What a cursor may carry for each keyset field; anything else (an operator document such as
+# {"$ne": null} in a crafted cursor) would change the meaning of the page filter
+CURSOR_TYPES = {"_id": (ObjectId,), "word_count": (int,)}
+SCALAR_TYPES = (str, int, float, datetime, ObjectId)
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    # Extended JSON keeps ObjectIds and dates typed on the way back in
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise InvalidPageRequest(f"invalid cursor: {token!r}")
+    if not isinstance(values, list):
+        raise InvalidPageRequest(f"invalid cursor: {token!r}")
+    return values
+
+
+def check_cursor_values(token, fields, values):
+    # values come from the client, so each must be a plain value of its field's type before it goes
+    # into a filter; a sort value may be null for documents without the field, an _id never is
+    for field, value in zip(fields, values):
+        if value is None and field != "_id":
+            continue
+        if isinstance(value, bool) or not isinstance(value, CURSOR_TYPES.get(field, SCALAR_TYPES)):
+            raise InvalidPageRequest(f"invalid cursor: {token!r}")
+
+
+def limit_argument(args):
+    try:
+        limit = int(args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise InvalidPageRequest(f"invalid limit: {args.get('limit')!r}")
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def fields_argument(args, default):
+    # Only whitelisted article fields can be projected; unknown names are rejected rather than ignored
+    if "fields" not in args:
+        return list(default)
+    fields = [field.strip() for field in args["fields"].split(",") if field.strip()]
+    unknown = [field for field in fields if field not in ARTICLE_FIELDS]
+    if unknown or not fields:
+        raise InvalidPageRequest(f"unknown fields: {', '.join(unknown) or 'none given'}")
+    return fields
+
+
+def keyset_filter(sort_field, direction, values):
+    # Everything strictly after the last (sort_field, _id) the caller has seen
+    operator = "$gt" if direction > 0 else "$lt"
+    if sort_field is None:
+        return {"_id": {operator: values[0]}}
+    last_value, last_id = values
+    return {"$or": [{sort_field: {operator: last_value}},
+                    {sort_field: last_value, "_id": {operator: last_id}}]}
+
+
+def page_query(query, args, default_fields, sort_field=None, direction=1):
+    # The find() for one page of a keyset-paginated list: filter, projection, sort, page size and fields.
+    # Sorting on (sort_field, _id) keeps pages stable; each route has an index ending in _id for it.
+    limit = limit_argument(args)
+    fields = fields_argument(args, default_fields)
+    if "cursor" in args:
+        values = decode_cursor(args["cursor"])
+        keyset_fields = ["_id"] if sort_field is None else [sort_field, "_id"]
+        if len(values) != len(keyset_fields):
+            raise InvalidPageRequest(f"invalid cursor: {args['cursor']!r}")
+        check_cursor_values(args["cursor"], keyset_fields, values)
+        query = {"$and": [query, keyset_filter(sort_field, direction, values)]}
+
+    sort = ([(sort_field, direction)] if sort_field else []) + [("_id", direction)]
+    projection = dict.fromkeys(fields, 1)
+    projection.update(dict.fromkeys([key for key, _ in sort], 1))
+    return query, projection, sort, limit, fields
+
+
+def page_result(documents, limit, fields, sort_field=None):
+    # The page to return plus the cursor for the next one (None on the last page); documents holds
+    # up to limit + 1 results so the last page is recognised without a count
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor([last.get(sort_field), last["_id"]] if sort_field else [last["_id"]])
+
+    items = [{field: document[field] for field in fields if field in document} for document in documents]
+    return items, next_cursor
@@ -0,0 +1,101 @@
+import argparse
+import json
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from parquet_export import open_dataset
+from scheduler import parse_month
+
+# The dashboard aggregations of queries.py and rollups.py over a Parquet export (parquet_export.py),
+# computed with Arrow kernels on just the columns each one needs. Results have the API's shape:
+# [{"_id": value, "count": n}, ...] ordered like queries.TOP, count descending then value.
+WORD_COUNT_BOUNDARIES = [0, 100, 500, 1000, 5000, 10000]
+WORD_COUNT_DEFAULT = "Over 10,000"
+
+
+def read_columns(source, columns, months=None):
+    # source is a dataset from open_dataset() or an already loaded table; months=[(2020, 11), ...]
+    # reads only those year=/month= partitions
+    if isinstance(source, pa.Table):
+        return source.select(columns)
+    partition_filter = None
+    for year, month in months or ():
+        condition = (ds.field("year") == year) & (ds.field("month") == month)
+        partition_filter = condition if partition_filter is None else partition_filter | condition
+    return source.to_table(columns=columns, filter=partition_filter)
+
+
+def counted(values, limit=0):
+    # value_counts counts nulls as a value too, like MongoDB's $group on a missing field
+    counts = pc.value_counts(values)
+    keys = counts.field("values")
+    if pa.types.is_dictionary(keys.type):
+        keys = keys.dictionary_decode()
+    table = pa.table({"_id": keys, "count": counts.field("counts")})
+    # MongoDB orders null before any string
+    order = pc.sort_indices(table, sort_keys=[("count", "descending", "at_end"), ("_id", "ascending", "at_start")])
+    if limit:
+        order = order[:limit]
+    return table.take(order).to_pylist()
+
+
+def top_keywords(source, limit=10, months=None):
+    keywords = read_columns(source, ["keywords"], months)["keywords"]
+    return counted(pc.list_flatten(keywords), limit)
+
+
+def top_authors(source, limit=10, months=None):
+    return counted(read_columns(source, ["author"], months)["author"], limit)
+
+
+def top_classes(source, limit=10, months=None):
+    classes = pc.list_flatten(read_columns(source, ["classes"], months)["classes"])
+    return counted(pc.struct_field(classes, "value"), limit)
+
+
+def articles_per_day(source, months=None):
+    # day_counts: articles per UTC publication day, in date order; undated articles are left out
+    published = read_columns(source, ["publication_date"], months)["publication_date"]
+    days = pc.strftime(published.drop_null(), format="%Y-%m-%d")
+    counts = pc.value_counts(days)
+    table = pa.table({"_id": counts.field("values"), "count": counts.field("counts")})
+    return table.sort_by("_id").to_pylist()
+
+
+def articles_by_word_count_range(source, months=None):
+    # The $bucket stage of queries.articles_by_word_count_range: each bucket is named by its lower
+    # boundary, everything from the last boundary up is the default bucket, and empty buckets are
+    # not listed. Counting the articles at or above each boundary takes one vectorized pass apiece.
+    word_counts = read_columns(source, ["word_count"], months)["word_count"]
+    at_least = [pc.sum(pc.greater_equal(word_counts, boundary)).as_py() or 0 for boundary in WORD_COUNT_BOUNDARIES]
+    buckets = [{"_id": boundary, "count": at_least[i] - at_least[i + 1]}
+               for i, boundary in enumerate(WORD_COUNT_BOUNDARIES[:-1])]
+    buckets.append({"_id": WORD_COUNT_DEFAULT, "count": at_least[-1]})
+    return [bucket for bucket in buckets if bucket["count"]]
+
+
+REPORTS = {
+    "top_keywords": top_keywords,
+    "top_authors": top_authors,
+    "top_classes": top_classes,
+    "articles_per_day": articles_per_day,
+    "articles_by_word_count_range": articles_by_word_count_range,
+}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Dashboard aggregations over a Parquet export of the articles")
+    arg_parser.add_argument("report", choices=sorted(REPORTS))
+    arg_parser.add_argument("--input", default="./parquet", help="directory written by parquet_export.py")
+    arg_parser.add_argument("--months", help="comma-separated YYYY-MM partitions to read, default all")
+    args = arg_parser.parse_args()
+
+    months = [parse_month(month) for month in args.months.split(",")] if args.months else None
+    start = time.perf_counter()
+    result = REPORTS[args.report](open_dataset(args.input), months=months)
+    elapsed = time.perf_counter() - start
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+    print(f"{args.report}: {elapsed * 1000:.1f} ms")
@@ -0,0 +1,143 @@
+import argparse
+import time
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from normalization import to_stored_date
+
+# Columns of the exported corpus. Repeated labels (author, language, keyword and class values) are
+# Arrow dictionaries and stay dictionary-encoded in Parquet; unique text (url, title, content) is not,
+# since a dictionary as large as the column only costs space. Dates are naive UTC, as stored in MongoDB.
+LABEL = pa.dictionary(pa.int32(), pa.string())
+SCHEMA = pa.schema([
+    ("post_id", pa.string()),
+    ("url", pa.string()),
+    ("title", pa.string()),
+    ("author", LABEL),
+    ("keywords", pa.list_(pa.string())),
+    ("classes", pa.list_(pa.struct([("key", pa.string()), ("value", pa.string())]))),
+    ("lang", LABEL),
+    ("thumbnail", pa.string()),
+    ("publication_date", pa.timestamp("ms")),
+    ("last_updated_date", pa.timestamp("ms")),
+    ("video_duration", pa.string()),
+    ("word_count", pa.int32()),
+    ("keyword_count", pa.int32()),
+    ("content", pa.string()),
+    ("year", pa.int16()),
+    ("month", pa.int8()),
+])
+DICTIONARY_COLUMNS = ["author", "lang", "keywords.list.element", "classes.list.element.key",
+                      "classes.list.element.value"]
+
+# year=2020/month=11/part-0.parquet, the Parquet counterpart of the scraper's {year}_{month} directories
+PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16()), ("month", pa.int8())]), flavor="hive")
+
+# The stored article without Mongo's id and the derived search fields, which the export rebuilds nothing from
+MONGO_PROJECTION = {"_id": 0, "search_text": 0, "search_keywords": 0}
+
+
+def text_or_none(value):
+    # Values are exported as stored, placeholders such as 'No Author' included, so counts match MongoDB's
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def partition_of(document, published):
+    # The sitemap month the article was crawled under (year/month as the loader stores them), else its
+    # publication month
+    try:
+        return int(document["year"]), int(document["month"])
+    except (KeyError, TypeError, ValueError):
+        if published is None:
+            return None, None
+        return published.year, published.month
+
+
+def to_row(document):
+    # One scraped (FileUtility/JSONL) or stored (MongoDB) article as a row of SCHEMA
+    keywords = document.get("keywords")
+    keywords = [keyword for keyword in keywords if isinstance(keyword, str)] if isinstance(keywords, list) else []
+    classes = document.get("classes")
+    classes = [{"key": text_or_none(item.get("key")), "value": text_or_none(item.get("value"))}
+               for item in classes if isinstance(item, dict)] if isinstance(classes, list) else []
+    published = to_stored_date(document.get("publication_date"))
+    word_count = document.get("word_count")
+    if not isinstance(word_count, int) and isinstance(document.get("content"), str):
+        word_count = len(document["content"].split())
+    year, month = partition_of(document, published)
+    return {
+        "post_id": text_or_none(document.get("post_id")),
+        "url": text_or_none(document.get("url")),
+        "title": text_or_none(document.get("title")),
+        "author": text_or_none(document.get("author")),
+        "keywords": keywords,
+        "classes": classes,
+        "lang": text_or_none(document.get("lang")),
+        "thumbnail": text_or_none(document.get("thumbnail")),
+        "publication_date": published,
+        "last_updated_date": to_stored_date(document.get("last_updated_date")),
+        "video_duration": text_or_none(document.get("video_duration")),
+        "word_count": word_count if isinstance(word_count, int) else None,
+        "keyword_count": len(keywords),
+        "content": document.get("content") if isinstance(document.get("content"), str) else None,
+        "year": year,
+        "month": month,
+    }
+
+
+def iter_record_batches(documents, schema=SCHEMA, batch_size=10000):
+    # Column lists of batch_size rows at a time, so memory stays flat however large the corpus
+    columns = {name: [] for name in schema.names}
+    for document in documents:
+        for name, value in to_row(document).items():
+            if name in columns:
+                columns[name].append(value)
+        if len(columns["year"]) >= batch_size:
+            yield pa.RecordBatch.from_pydict(columns, schema=schema)
+            columns = {name: [] for name in schema.names}
+    if columns["year"]:
+        yield pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def export_parquet(documents, output_directory, include_content=True, batch_size=10000, compression="zstd"):
+    # Rewrites the partitions the documents fall into; other months already in output_directory are kept
+    schema = SCHEMA if include_content else SCHEMA.remove(SCHEMA.get_field_index("content"))
+    file_format = ds.ParquetFileFormat()
+    ds.write_dataset(
+        iter_record_batches(documents, schema, batch_size), output_directory, schema=schema, format=file_format,
+        partitioning=PARTITIONING, basename_template="part-{i}.parquet",
+        existing_data_behavior="delete_matching", max_rows_per_group=64 * 1024,
+        file_options=file_format.make_write_options(compression=compression, use_dictionary=DICTIONARY_COLUMNS),
+    )
+
+
+def open_dataset(directory):
+    return ds.dataset(directory, format="parquet", partitioning=PARTITIONING)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Export the article corpus to Parquet partitioned by year/month")
+    arg_parser.add_argument("--source", choices=["files", "mongo"], default="files",
+                            help="files reads the scraper's {year}_{month} directories, mongo the articles collection")
+    arg_parser.add_argument("--data-dir", default="./data")
+    arg_parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    arg_parser.add_argument("--output", default="./parquet")
+    arg_parser.add_argument("--no-content", action="store_true", help="leave out the article text")
+    arg_parser.add_argument("--batch-size", type=int, default=10000)
+    args = arg_parser.parse_args()
+
+    if args.source == "mongo":
+        import pymongo
+        collection = pymongo.MongoClient(args.mongo_uri)["almayadeen"]["articles"]
+        projection = {**MONGO_PROJECTION, **({"content": 0} if args.no_content else {})}
+        source = collection.find({}, projection).batch_size(args.batch_size)
+    else:
+        from inserting_data import iter_documents
+        source = iter_documents(args.data_dir)
+
+    start = time.perf_counter()
+    export_parquet(source, args.output, include_content=not args.no_content, batch_size=args.batch_size)
+    dataset = open_dataset(args.output)
+    print(f"Exported {dataset.count_rows()} articles to {args.output} in {time.perf_counter() - start:.1f}s "
+          f"({len(dataset.files)} files)")
@@ -0,0 +1,269 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+from crawl_state import CrawlState
+from dedup import DedupIndex
+from extraction import DEFAULT_BACKEND
+from http_cache import HttpCache
+from http_transport import RETRY_STATUSES, HttpTransport
+from article_writer import open_sink
+from main import SITE_URL, ArticleScraper, SitemapParser, is_saved_post
+from scheduler import DEFAULT_RANGES, NEWEST_FIRST, ArticleBudget, HostLimiter, SitemapScheduler
+
+STOP = object()
+
+
+def parse_page(url, content, backend):
+    # Runs in a worker process, so the GIL no longer serializes HTML parsing
+    return ArticleScraper(url, backend=backend).parse(content)
+
+
+class CrawlPipeline:
+    # fetch threads -> bounded raw-page queue -> process pool of parsers -> writer (the caller of run())
+    def __init__(self, fetch_page, fetch_workers=16, parse_workers=None, raw_queue_size=64, parse_backlog=None,
+                 backend=DEFAULT_BACKEND, skip_unchanged=False, limiter=None, budget=None, max_retries=2):
+        self.fetch_page = fetch_page  # url -> FetchResult, e.g. HttpTransport.fetch
+        # HostLimiter: per-host AIMD cap on the fetch threads. fetch_page should then leave 429/5xx
+        # responses to it (HttpTransport(retry_statuses=())); they are retried up to max_retries times here
+        self.limiter = limiter
+        self.max_retries = max_retries
+        # ArticleBudget: fetch threads reserve a slot per page and stop once it is spent; the caller of
+        # run() releases each slot when it has settled the page
+        self.budget = budget
+        self.skip_unchanged = skip_unchanged  # See ArticleScraper.skip_unchanged
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers or os.cpu_count()
+        self.raw_queue_size = raw_queue_size  # Downloaded pages waiting for a parser
+        self.parse_backlog = parse_backlog or self.parse_workers * 2  # Pages parsing or parsed but not yet written
+        self.backend = backend
+        # One parser pool for every run() (one per sitemap), so its worker processes start only once
+        self.pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fetch_with_limit(self, url):
+        # Holds one of the host's AIMD slots per request and reports how it went. A throttled request
+        # is tried again once the limiter has cut the window and waited out any Retry-After.
+        if self.limiter is None:
+            return self.fetch_page(url)
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            self.limiter.acquire(host)
+            started = time.monotonic()
+            status = retry_after = None
+            try:
+                result = self.fetch_page(url)
+                status = 200
+                return result
+            except Exception as e:
+                response = getattr(e, 'response', None)  # requests.HTTPError; None for connection errors
+                if response is not None:
+                    status, retry_after = response.status_code, response.headers.get('Retry-After')
+                if status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    raise
+            finally:
+                self.limiter.release(host, time.monotonic() - started, status, retry_after)
+            attempt += 1
+
+    def run(self, urls):
+        # Yields (url, article, error) as pages finish; article is None for skipped pages and failures
+        stop = threading.Event()
+        url_queue = queue.Queue(maxsize=self.fetch_workers * 2)
+        raw_queue = queue.Queue(maxsize=self.raw_queue_size)
+        results = queue.Queue()
+        parse_slots = threading.Semaphore(self.parse_backlog)
+        submitted = set()  # Parses of this run still queued or running in the shared pool
+
+        # Blocking put/get that give up once the run is stopped, so no stage can hang on a queue
+        def put(target, item):
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(source):
+            while not stop.is_set():
+                try:
+                    return source.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return STOP
+
+        def feed():
+            for url in urls:
+                if not put(url_queue, url):
+                    return
+            for _ in range(self.fetch_workers):
+                put(url_queue, STOP)
+
+        def reserve():
+            # Waits while every remaining slot is held by a page in flight; False once the budget is spent
+            while not stop.is_set():
+                if self.budget.reserve():
+                    return True
+                if self.budget.exhausted:
+                    return False
+                time.sleep(0.05)
+            return False
+
+        def fetch():
+            while True:
+                url = get(url_queue)
+                if url is STOP or (self.budget is not None and not reserve()):
+                    put(raw_queue, STOP)
+                    return
+                try:
+                    print(f"Scraping article: {url}")
+                    result = self.fetch_with_limit(url)
+                except Exception as e:
+                    print(f"Error scraping article {url}: {e}")
+                    results.put((url, None, str(e)))
+                    continue
+                if result.not_modified and self.skip_unchanged:
+                    print(f"Skipping unchanged article since last crawl: {url}")
+                    results.put((url, None, None))
+                    continue
+                if not put(raw_queue, (url, result.content)):
+                    return
+
+        def dispatch():
+            # Parsed pages are handed to the writer as futures; a slot frees up once the writer consumes one
+            stopped_fetchers = 0
+            while stopped_fetchers < self.fetch_workers:
+                item = get(raw_queue)
+                if item is STOP:
+                    if stop.is_set():
+                        return
+                    stopped_fetchers += 1
+                    continue
+                while not parse_slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                url, content = item
+                try:
+                    future = self.pool.submit(parse_page, url, content, self.backend)
+                except RuntimeError:  # The pipeline was closed while this run was still going
+                    return
+                submitted.add(future)
+                future.add_done_callback(submitted.discard)
+                results.put((url, future, None))
+            results.put(STOP)
+
+        dispatcher = threading.Thread(target=dispatch, daemon=True)
+        threads = [threading.Thread(target=feed, daemon=True), dispatcher]
+        threads += [threading.Thread(target=fetch, daemon=True) for _ in range(self.fetch_workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = results.get()
+                if item is STOP:
+                    break
+                url, article, error = item
+                if isinstance(article, Future):
+                    try:
+                        article = article.result()
+                    except Exception as e:
+                        print(f"Error scraping article {url}: {e}")
+                        article, error = None, str(e)
+                    finally:
+                        parse_slots.release()
+                yield url, article, error
+        finally:
+            stop.set()
+            # The pool outlives this run: drop the parses nobody will read instead of shutting it down
+            dispatcher.join()
+            for future in list(submitted):
+                future.cancel()
+
+
+def main_pipeline(max_articles=2000, fetch_workers=16, parse_workers=None, raw_queue_size=64, parse_backlog=None,
+                  backend=DEFAULT_BACKEND, output='jsonl', base_url=SITE_URL, ranges=DEFAULT_RANGES,
+                  policy=NEWEST_FIRST, recrawl_after=None):
+    cache = HttpCache()
+    # The limiter below handles 429/5xx for article pages, so their transport only retries connection
+    # errors; sitemaps keep the transport's own retries
+    transport = HttpTransport(pool_size=fetch_workers, cache=cache, retry_statuses=())
+    sitemap_transport = HttpTransport(cache=cache)
+    state = CrawlState()
+    dedup = DedupIndex()
+    budget = ArticleBudget(max_articles)
+    limiter = HostLimiter(maximum=fetch_workers)
+    sink = open_sink(output, on_saved=state.mark_saved)
+    parser = SitemapParser(sitemap_transport, base_url)
+    scheduler = SitemapScheduler(parser, state, ranges, policy, recrawl_after)
+    pipeline = CrawlPipeline(transport.fetch,
+                             fetch_workers=fetch_workers, parse_workers=parse_workers,
+                             raw_queue_size=raw_queue_size, parse_backlog=parse_backlog, backend=backend,
+                             limiter=limiter, budget=budget)
+
+    try:
+        for sitemap_url in scheduler.sitemap_urls():
+            print(f"Processing sitemap: {sitemap_url}")
+            year, month = sitemap_url.split('-')[-2], sitemap_url.split('-')[-1].replace('.xml', '')
+            article_urls = parser.get_article_urls(sitemap_url)
+
+            if not article_urls:
+                print("No articles found.")
+                continue
+
+            state.add_pending(sitemap_url, article_urls)
+            todo = [url for url in article_urls if not state.is_done(url)]
+            for url, article, error in pipeline.run(todo):
+                saved = False
+                # Already saved under another URL: the same post_id, or the same or nearly the same text
+                if article and (is_saved_post(state, article) or dedup.check(article)):
+                    state.mark_duplicate(url, article.post_id)
+                elif article:
+                    sink.write(year, month, article)  # Marked done in the state once it is on disk
+                    saved = True
+                elif error:
+                    state.mark_failed(url, error)
+                else:
+                    state.mark_skipped(url)
+                budget.release(saved)
+                if saved:
+                    print(f"Processed article {budget.saved}/{max_articles}")
+                if budget.exhausted:
+                    break
+
+            sink.flush()
+            state.finish_sitemap(sitemap_url)
+            print(f"Processed {len(article_urls)} articles for {year}-{month}. Total so far: {budget.saved}")
+
+            if budget.exhausted:
+                print(f"Reached {max_articles} articles. Stopping.")
+                break
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    finally:
+        sink.close()
+        pipeline.close()
+        transport.print_stats()
+        transport.close()
+        sitemap_transport.close()
+        limiter.print_stats()
+        state.print_stats()
+        state.close()
+        dedup.print_stats()
+        dedup.close()
+
+
+if __name__ == "__main__":
+    main_pipeline()
@@ -0,0 +1,426 @@
+import asyncio
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from normalization import to_stored_date
+from pagination import InvalidPageRequest, page_query, page_result
+from rollups import ROLLUP_PIPELINES
+from search import normalize_keyword, text_query
+
+# The database work behind each API route, described once and run by either server:
+# flask_app.py executes these with pymongo, asgi_app.py with motor.
+Find = namedtuple("Find", "collection filter projection sort skip limit", defaults=({}, None, None, 0, 0))
+FindOne = namedtuple("FindOne", "collection filter projection", defaults=(None,))
+# single: the route returns the first document, or this default when there is none
+Aggregate = namedtuple("Aggregate", "collection pipeline single", defaults=(None,))
+# A keyset-paginated article list (pagination.py); a None filter means no article can match
+Page = namedtuple("Page", "filter fields sort_field direction", defaults=(None, 1))
+# Several named queries answered together as {name: result}; the async runner issues them concurrently
+Combined = namedtuple("Combined", "queries")
+
+TOP = [("count", -1), ("_id", 1)]
+
+
+def run(db, query):
+    if query is None:
+        return []
+    if isinstance(query, Combined):
+        return {name: run(db, part) for name, part in query.queries.items()}
+    if isinstance(query, FindOne):
+        return db[query.collection].find_one(query.filter, query.projection)
+    if isinstance(query, Find):
+        return list(db[query.collection].find(query.filter, query.projection, sort=query.sort,
+                                              skip=query.skip, limit=query.limit))
+    result = list(db[query.collection].aggregate(query.pipeline))
+    if query.single is not None:
+        return result[0] if result else query.single
+    return result
+
+
+async def run_async(db, query):
+    if query is None:
+        return []
+    if isinstance(query, Combined):
+        results = await asyncio.gather(*(run_async(db, part) for part in query.queries.values()))
+        return dict(zip(query.queries, results))
+    if isinstance(query, FindOne):
+        return await db[query.collection].find_one(query.filter, query.projection)
+    if isinstance(query, Find):
+        return await db[query.collection].find(query.filter, query.projection, sort=query.sort,
+                                               skip=query.skip, limit=query.limit).to_list(None)
+    result = await db[query.collection].aggregate(query.pipeline).to_list(None)
+    if query.single is not None:
+        return result[0] if result else query.single
+    return result
+
+
+def page_find(page, args):
+    query, projection, sort, limit, fields = page_query(page.filter, args, page.fields, page.sort_field,
+                                                        page.direction)
+    return Find("articles", query, projection, sort=sort, limit=limit + 1), limit, fields
+
+
+def run_page(db, page, args):
+    if page.filter is None:
+        return [], None
+    find, limit, fields = page_find(page, args)
+    return page_result(run(db, find), limit, fields, page.sort_field)
+
+
+async def run_page_async(db, page, args):
+    if page.filter is None:
+        return [], None
+    find, limit, fields = page_find(page, args)
+    return page_result(await run_async(db, find), limit, fields, page.sort_field)
+
+
+# Dates are stored as real dates with precomputed publication_year/month/day fields by the loader
+# (normalization.py), so no query converts or re-parses date strings on the request path.
+# The count routes read the rollup collections the loader keeps current (rollups.py).
+
+def top_keywords():
+    return Find("keyword_counts", sort=TOP, limit=10)
+
+
+def top_authors():
+    return Find("author_counts", sort=TOP, limit=10)
+
+
+def articles_by_publication_date():
+    return Find("day_counts", sort=[("_id", 1)])
+
+
+def articles_by_word_count():
+    return Aggregate("articles", [
+        {"$match": {"word_count": {"$exists": True}}},
+        {"$group": {"_id": "$word_count", "count": {"$sum": 1}}},
+        {"$sort": {"_id": 1}}
+    ])
+
+
+def articles_by_title_length():
+    return Aggregate("articles", [
+        {"$match": {"title_length": {"$exists": True}}},
+        {"$group": {"_id": "$title_length", "count": {"$sum": 1}}},
+        {"$sort": {"_id": 1}}
+    ])
+
+
+def articles_grouped_by_coverage():
+    return Find("class_counts", sort=TOP)
+
+
+def articles_by_language():
+    return Find("language_counts", sort=TOP)
+
+
+def articles_by_classes():
+    return Find("class_counts", sort=TOP)
+
+
+def recent_articles():
+    return Find("articles", {}, {"title": 1, "publication_date": 1, "_id": 0},
+                sort=[("publication_date", -1)], limit=10)
+
+
+def articles_by_authors():
+    return Aggregate("author_counts", [{"$project": {"article_count": "$count"}}])
+
+
+def top_classes():
+    return Find("class_counts", sort=TOP, limit=10)
+
+
+def article_details(postid):
+    return FindOne("articles", {"post_id": postid}, {"_id": 0})
+
+
+def longest_articles():
+    # word_count is stored and indexed at ingest, so this walks the index instead of splitting every article
+    return Find("articles", {}, {"title": 1, "word_count": 1}, sort=[("word_count", -1)], limit=10)
+
+
+def shortest_articles():
+    return Find("articles", {"word_count": {"$gte": 0}}, {"title": 1, "word_count": 1},
+                sort=[("word_count", 1)], limit=10)
+
+
+def articles_by_keyword_count():
+    return Aggregate("articles", [
+        {"$match": {"keyword_count": {"$exists": True}}},
+        # Group by the number of keywords and count the occurrences
+        {"$group": {"_id": "$keyword_count", "count": {"$sum": 1}}},
+        # Sort by the number of keywords count
+        {"$sort": {"_id": 1}}
+    ])
+
+
+def articles_by_thumbnail():
+    return Find("thumbnail_counts")
+
+
+def articles_by_coverage():
+    return Find("class_counts", sort=[("_id", 1)])
+
+
+def popular_keywords_last_X_days(days):
+    cutoff_date = datetime.now() - timedelta(days=days)
+    return Aggregate("articles", [
+        {"$match": {"publication_date": {"$gte": cutoff_date}}},
+        {"$unwind": "$keywords"},
+        {
+            "$group": {
+                "_id": {
+                    "keyword": "$keywords",
+                    "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$publication_date"}}
+                },
+                "count": {"$sum": 1}
+            }
+        },
+        {"$sort": {"count": -1}},
+        {"$limit": 10}
+    ])
+
+
+def articles_by_month():
+    return Aggregate("articles", [
+        {"$match": {"publication_year": {"$exists": True}}},
+        {
+            "$group": {
+                "_id": {
+                    "year": "$publication_year",
+                    "month": "$publication_month"
+                },
+                "count": {"$sum": 1}
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "date": {
+                    "$dateFromParts": {
+                        "year": "$_id.year",
+                        "month": "$_id.month",
+                        "day": 1
+                    }
+                },
+                "count": 1
+            }
+        },
+        {
+            "$sort": {
+                "date": 1
+            }
+        }
+    ])
+
+
+def articles_by_word_count_range():
+    return Aggregate("articles", [
+        {"$match": {"word_count": {"$gte": 0}}},
+        {
+            "$bucket": {
+                "groupBy": "$word_count",
+                "boundaries": [0, 100, 500, 1000, 5000, 10000],  #these are the ranges of the articles
+                "default": "Over 10,000",  # Anything over 10,000 words goes into this bucket
+                "output": {
+                    "count": {"$sum": 1}  #the number of articles in each range
+                }
+            }
+        }
+    ])
+
+
+def articles_grouped_by_specific_date():
+    return Find("day_counts", sort=[("_id", 1)])
+
+
+def articles_with_keyword(keyword):
+    return Aggregate("articles", [
+        {
+            "$match": {
+                # Whole keywords in the normalized form stored at ingest (search.py), so case, diacritics
+                # and letter variants do not matter and the search_keywords index answers the match
+                "search_keywords": normalize_keyword(keyword)
+            }
+        },
+        {
+            "$group": {
+                "_id": None,  # We don't need to group by a specific field, just count
+                "keyword": {"$first": keyword},  # Include the keyword itself in the result
+                "count": {"$sum": 1}  # Count the matching articles
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,  # Exclude the _id field from the result
+                "keyword": 1,
+                "count": 1
+            }
+        }
+    ], single={"keyword": keyword, "count": 0})
+
+
+def articles_containing_text(text, page=1, per_page=20):
+    # Ranked phrase search on the text index (search.py)
+    query = text_query(text)
+    if query is None:
+        return None
+    return Find("articles", query, {"title": 1, "url": 1, "_id": 0, "score": {"$meta": "textScore"}},
+                sort=[("score", {"$meta": "textScore"})], skip=(page - 1) * per_page, limit=per_page)
+
+
+# Paginated article lists
+
+def articles_by_keyword(keyword):
+    return Page({"keywords": keyword}, ["title", "url"])
+
+
+def articles_by_author(author_name):
+    return Page({"author": author_name}, ["title", "url"])
+
+
+def all_article_details():
+    return Page({}, ["title", "keywords", "publication_date"])
+
+
+def articles_with_video():
+    return Page({"video_duration": {"$ne": None}}, ["title", "url"])
+
+
+def articles_by_year(year):
+    return Page({"year": year}, ["title", "url"])
+
+
+def articles_updated_after_publication():
+    query = {
+        "publication_date": {"$type": "date"},
+        "last_updated_date": {"$type": "date"},
+        "$expr": {
+            "$gt": ["$last_updated_date", "$publication_date"]
+        }
+    }
+    # Metadata only by default; the full body is available with ?fields=...,content
+    return Page(query, ["_id", "title", "url", "publication_date", "last_updated_date"])
+
+
+def articles_by_specific_date(date):
+    day = to_stored_date(date)
+    if day is None:
+        return Page(None, [])
+    if len(date) == 10:  # YYYY-MM-DD matches the whole day
+        query = {"publication_year": day.year, "publication_month": day.month, "publication_day": day.day}
+    else:
+        query = {"publication_date": day}
+    return Page(query, ["title", "url"])
+
+
+def articles_with_keyword_count(keyword_count):
+    return Page({"keyword_count": keyword_count}, ["title", "url", "keyword_count"])
+
+
+def articles_with_more_than(word_count):
+    # Index range scan on the stored word_count, longest first
+    return Page({"word_count": {"$gt": word_count}}, ["title", "url", "word_count"],
+                sort_field="word_count", direction=-1)
+
+
+# Dashboard facet -> (rollup collection, sort, limit); each facet has the shape of its single route
+DASHBOARD_FACETS = {
+    "top_keywords": ("keyword_counts", TOP, 10),
+    "top_authors": ("author_counts", TOP, 10),
+    "top_classes": ("class_counts", TOP, 10),
+    "languages": ("language_counts", TOP, 0),
+    "thumbnails": ("thumbnail_counts", None, 0),
+    "days": ("day_counts", [("_id", 1)], 0),
+}
+DASHBOARD_SOURCES = ("rollups", "facet")
+
+
+def facets_argument(args):
+    # ?facets=top_keywords,days picks facets (all by default); ?source=facet recomputes from the articles
+    facets = [facet for facet in args.get("facets", ",".join(DASHBOARD_FACETS)).split(",") if facet]
+    unknown = [facet for facet in facets if facet not in DASHBOARD_FACETS]
+    if unknown or not facets:
+        raise InvalidPageRequest(f"unknown facets: {', '.join(unknown) or 'none given'}")
+    source = args.get("source", "rollups")
+    if source not in DASHBOARD_SOURCES:
+        raise InvalidPageRequest(f"unknown source: {source!r}")
+    return facets, source
+
+
+def dashboard_summary(facets, source="rollups"):
+    if source == "rollups":
+        # A handful of indexed reads of small summary collections
+        return Combined({facet: Find(DASHBOARD_FACETS[facet][0], sort=DASHBOARD_FACETS[facet][1],
+                                     limit=DASHBOARD_FACETS[facet][2]) for facet in facets})
+
+    # One $facet pass over the articles: every facet from a single collection scan, for when the
+    # rollups are being rebuilt or cannot be trusted
+    stages = {}
+    for facet in facets:
+        rollup, sort, limit = DASHBOARD_FACETS[facet]
+        stages[facet] = (ROLLUP_PIPELINES[rollup] + ([{"$sort": dict(sort)}] if sort else [])
+                         + ([{"$limit": limit}] if limit else []))
+    return Aggregate("articles", [{"$facet": stages}], single={facet: [] for facet in facets})
+
+
+def export_articles(fields):
+    # Whole-corpus export (export.py); the caller iterates the cursor instead of building a list
+    projection = dict.fromkeys(fields, 1)
+    projection.setdefault("_id", 0)
+    return Find("articles", {}, projection, sort=[("_id", 1)])
+
+
+# Route endpoint -> query, for servers that dispatch generically
+ROUTE_QUERIES = {query.__name__: query for query in (
+    top_keywords, top_authors, articles_by_publication_date, articles_by_word_count, articles_by_title_length,
+    articles_grouped_by_coverage, articles_by_language, articles_by_classes, recent_articles, articles_by_authors,
+    top_classes, article_details, longest_articles, shortest_articles, articles_by_keyword_count,
+    articles_by_thumbnail, articles_by_coverage, popular_keywords_last_X_days, articles_by_month,
+    articles_by_word_count_range, articles_grouped_by_specific_date, articles_with_keyword,
+)}
+PAGE_QUERIES = {query.__name__: query for query in (
+    articles_by_keyword, articles_by_author, all_article_details, articles_with_video, articles_by_year,
+    articles_updated_after_publication, articles_by_specific_date, articles_with_keyword_count,
+    articles_with_more_than,
+)}
+
+# URL rule of every route, by endpoint name (the query's name above). flask_app.py registers its views
+# on these and asgi_app.py matches them, so both servers expose identical routes
+ROUTES = {
+    "top_keywords": "/top_keywords",
+    "top_authors": "/top_authors",
+    "articles_by_publication_date": "/articles_by_publication_date",
+    "articles_by_word_count": "/articles_by_word_count",
+    "articles_by_title_length": "/articles_by_title_length",
+    "articles_grouped_by_coverage": "/articles_grouped_by_coverage",
+    "articles_by_language": "/articles_by_language",
+    "articles_by_classes": "/articles_by_classes",
+    "recent_articles": "/recent_articles",
+    "articles_by_keyword": "/articles_by_keyword/<keyword>",
+    "articles_by_author": "/articles_by_author/<author_name>",
+    "articles_by_authors": "/articles_by_authors",
+    "top_classes": "/top_classes",
+    "article_details": "/article_details/<postid>",
+    "all_article_details": "/article_details",
+    "articles_with_video": "/articles_with_video",
+    "articles_by_year": "/articles_by_year/<year>",
+    "longest_articles": "/longest_articles",
+    "shortest_articles": "/shortest_articles",
+    "articles_by_keyword_count": "/articles_by_keyword_count",
+    "articles_by_thumbnail": "/articles_by_thumbnail",
+    "articles_updated_after_publication": "/articles_updated_after_publication",
+    "articles_by_coverage": "/articles_by_coverage",
+    "popular_keywords_last_X_days": "/popular_keywords_last_X_days/<int:days>",
+    "articles_by_month": "/articles_by_month",
+    "articles_by_word_count_range": "/articles_by_word_count_range",
+    "articles_by_specific_date": "/articles_by_specific_date/<date>",
+    "articles_grouped_by_specific_date": "/articles_by_specific_date",
+    "articles_with_keyword_count": "/articles_with_keyword_count/<int:keyword_count>",
+    "articles_containing_text": "/articles_containing_text/<text>",
+    "articles_with_keyword": "/articles_with_keyword/<keyword>",
+    "articles_with_more_than": "/articles_with_more_than/<int:word_count>",
+    "dashboard_summary": "/dashboard_summary",
+    "export_articles": "/export/articles",
+}
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+from flask import Response, g, jsonify, request
+
+GENERATION_ID = "articles"
+CACHED_HEADERS = ("X-Next-Cursor", "Link")  # Pagination headers (pagination.py) travel with the body
+
+
+class LocalCache:
+    # In-process LRU with per-entry expiry. Implements the get/set(ex=) subset of the
+    # redis-py client, so either one can back a ResponseCache (and this one stands in for Redis in tests)
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ex=None):
+        expires_at = time.monotonic() + ex if ex else None
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return True
+
+
+def open_backend(redis_url=None, max_entries=1024):
+    # Redis is optional: only needed when several app processes should share one cache
+    if not redis_url:
+        return LocalCache(max_entries)
+    import redis
+    return redis.Redis.from_url(redis_url)
+
+
+def read_generation(db):
+    state = db["cache_state"].find_one({"_id": GENERATION_ID})
+    return state["generation"] if state else 0
+
+
+def bump_generation(db):
+    # Called by whatever changes the articles (loader, migration, rollup rebuild); every cached
+    # response from an older generation stops matching
+    db["cache_state"].update_one({"_id": GENERATION_ID}, {"$inc": {"generation": 1}}, upsert=True)
+
+
+class ResponseCache:
+    def __init__(self, backend, generation, ttl=300, generation_check_interval=1.0, skip_endpoints=()):
+        self.backend = backend
+        self.generation = generation  # Callable returning the current data generation
+        self.ttl = ttl
+        self.generation_check_interval = generation_check_interval
+        self.skip_endpoints = {"static", "cache_stats", *skip_endpoints}
+        self.enabled = True
+
+        self.lock = threading.Lock()
+        self.current_generation = None
+        self.generation_checked_at = 0.0
+        self.counts = {"hit": 0, "miss": 0, "not_modified": 0}
+        self.latencies = {"hit": deque(maxlen=1000), "miss": deque(maxlen=1000)}
+
+    def init_app(self, app):
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.add_url_rule('/cache_stats', 'cache_stats', lambda: jsonify(self.stats()))
+
+    def cached_generation(self):
+        # Reads the shared counter at most once per interval instead of once per request
+        now = time.monotonic()
+        if self.current_generation is None or now - self.generation_checked_at >= self.generation_check_interval:
+            self.current_generation = self.generation()
+            self.generation_checked_at = now
+        return self.current_generation
+
+    def cache_key(self, generation):
+        # Path parameters are part of request.path; query arguments are sorted so their order does not matter
+        query = '&'.join(f"{name}={value}" for name, value in sorted(request.args.items(multi=True)))
+        return f"response:{generation}:{request.path}?{query}"
+
+    def before_request(self):
+        if not self.enabled or request.method != 'GET' or request.endpoint in self.skip_endpoints:
+            return None
+        g.cache_started = time.perf_counter()
+        g.cache_key = self.cache_key(self.cached_generation())
+        cached = self.backend.get(g.cache_key)
+        if cached is None:
+            return None
+
+        etag, mimetype, headers, body = cached.split(b"\n", 3)
+        response = Response(body, mimetype=mimetype.decode(), headers=json.loads(headers))
+        response.headers["X-Cache"] = "HIT"
+        g.cache_outcome = "hit"
+        return self.conditional(response, etag.decode())
+
+    def after_request(self, response):
+        if "cache_key" not in g:
+            return response
+        if "cache_outcome" not in g:
+            g.cache_outcome = "miss"
+            if response.status_code == 200 and not response.is_streamed:
+                body = response.get_data()
+                etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+                headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                entry = [etag.encode(), response.mimetype.encode(), json.dumps(headers).encode(), body]
+                self.backend.set(g.cache_key, b"\n".join(entry), ex=self.ttl)
+                response.headers["X-Cache"] = "MISS"
+                response = self.conditional(response, etag)
+        self.record(g.cache_outcome, response.status_code, time.perf_counter() - g.cache_started)
+        return response
+
+    def conditional(self, response, etag):
+        # Browsers revalidate every time and get an empty 304 while the data has not changed
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+
+    def record(self, outcome, status_code, seconds):
+        with self.lock:
+            self.counts[outcome] += 1
+            if status_code == 304:
+                self.counts["not_modified"] += 1
+            self.latencies[outcome].append(seconds)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counts["hit"] + self.counts["miss"]
+            stats = dict(self.counts, generation=self.current_generation,
+                         hit_rate=self.counts["hit"] / lookups if lookups else 0.0)
+            for outcome, latencies in self.latencies.items():
+                ordered = sorted(latencies)
+                stats[f"{outcome}_p50_ms"] = ordered[len(ordered) // 2] * 1000 if ordered else None
+                stats[f"{outcome}_p99_ms"] = ordered[int(len(ordered) * 0.99)] * 1000 if ordered else None
+        return stats
@@ -0,0 +1,128 @@
+import argparse
+from collections import Counter
+from datetime import datetime
+
+import pymongo
+from pymongo import IndexModel, UpdateOne
+
+from response_cache import bump_generation
+
+# Summary collections behind the dashboard routes, one document per value: {"_id": value, "count": n}.
+# The loader keeps them current with $inc (record_upserts); rebuild_rollups recomputes them from scratch.
+ROLLUP_PIPELINES = {
+    "keyword_counts": [
+        {"$unwind": "$keywords"},
+        {"$group": {"_id": "$keywords", "count": {"$sum": 1}}},
+    ],
+    "author_counts": [
+        {"$group": {"_id": "$author", "count": {"$sum": 1}}},
+    ],
+    "class_counts": [
+        {"$unwind": "$classes"},
+        {"$group": {"_id": "$classes.value", "count": {"$sum": 1}}},
+    ],
+    "day_counts": [
+        {"$match": {"publication_date": {"$type": "date"}}},
+        {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$publication_date"}},
+                    "count": {"$sum": 1}}},
+    ],
+    "language_counts": [
+        {"$group": {"_id": "$lang", "count": {"$sum": 1}}},
+    ],
+    "thumbnail_counts": [
+        {"$group": {"_id": {"$cond": {"if": {"$ne": ["$thumbnail", None]},
+                                      "then": "with_thumbnail", "else": "without_thumbnail"}},
+                    "count": {"$sum": 1}}},
+    ],
+}
+
+# Article fields the rollups are computed from
+ROLLUP_FIELDS = ("keywords", "author", "classes", "publication_date", "lang", "thumbnail")
+ROLLUP_PROJECTION = {"_id": 0, **{field: 1 for field in ROLLUP_FIELDS}}
+ROLLUP_INDEX = IndexModel([("count", -1), ("_id", 1)], name="count_-1__id_1")  # top-N routes
+
+
+def contributions(document):
+    # The (rollup, value) pairs one article adds to, mirroring ROLLUP_PIPELINES
+    counts = Counter()
+    keywords = document.get("keywords")
+    if isinstance(keywords, list):
+        counts.update(("keyword_counts", keyword) for keyword in keywords)
+    counts["author_counts", document.get("author")] += 1
+    classes = document.get("classes")
+    if isinstance(classes, list):
+        counts.update(("class_counts", item.get("value") if isinstance(item, dict) else None) for item in classes)
+    published = document.get("publication_date")
+    if isinstance(published, datetime):
+        counts["day_counts", published.strftime("%Y-%m-%d")] += 1
+    counts["language_counts", document.get("lang")] += 1
+    thumbnail = "with_thumbnail" if document.get("thumbnail") is not None else "without_thumbnail"
+    counts["thumbnail_counts", thumbnail] += 1
+    return counts
+
+
+def fetch_previous(collection, filters):
+    # Stored versions of the articles a batch is about to upsert, aligned with the upsert filters
+    post_ids = [f["post_id"] for f in filters if "post_id" in f]
+    urls = [f["url"] for f in filters if "url" in f]
+    branches = ([{"post_id": {"$in": post_ids}}] if post_ids else []) + ([{"url": {"$in": urls}}] if urls else [])
+    if not branches:
+        return [None] * len(filters)
+
+    stored = {}
+    for document in collection.find({"$or": branches}, {**ROLLUP_PROJECTION, "post_id": 1, "url": 1}):
+        stored["post_id", document.get("post_id")] = document
+        stored.setdefault(("url", document.get("url")), document)
+    return [stored.get(next(iter(f.items()))) for f in filters]
+
+
+def record_upserts(collection, previous, documents):
+    # Applies what a batch of upserts changed: new articles add their contributions, updated ones
+    # swap their old contributions for the new ($set keeps fields the new version does not carry)
+    changes = Counter()
+    for old, new in zip(previous, documents):
+        if old is None:
+            changes.update(contributions(new))
+        else:
+            changes.update(contributions({**old, **new}))
+            changes.subtract(contributions(old))
+    apply_changes(collection, changes)
+
+
+def apply_changes(collection, changes):
+    operations = {}
+    shrunk = set()
+    for (name, value), delta in changes.items():
+        if delta:
+            operations.setdefault(name, []).append(
+                UpdateOne({"_id": value}, {"$inc": {"count": delta}}, upsert=True))
+        if delta < 0:
+            shrunk.add(name)
+    for name, rollup_operations in operations.items():
+        collection.database[name].bulk_write(rollup_operations, ordered=False)
+    for name in shrunk:
+        # Values no article carries any more
+        collection.database[name].delete_many({"count": {"$lte": 0}})
+
+
+def ensure_rollup_indexes(collection):
+    for name in ROLLUP_PIPELINES:
+        collection.database[name].create_indexes([ROLLUP_INDEX])
+
+
+def rebuild_rollups(collection):
+    # Full recompute; $out swaps each summary in atomically, so routes never see a half-built rollup.
+    # Run it while the loader is idle, otherwise increments made during the rebuild are lost.
+    for name, pipeline in ROLLUP_PIPELINES.items():
+        collection.aggregate(pipeline + [{"$out": name}])
+        print(f"Rebuilt {name}: {collection.database[name].count_documents({})} values")
+    ensure_rollup_indexes(collection)
+    bump_generation(collection.database)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Rebuild the dashboard rollup collections from the articles")
+    arg_parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    args = arg_parser.parse_args()
+
+    rebuild_rollups(pymongo.MongoClient(args.mongo_uri)["almayadeen"]["articles"])
@@ -0,0 +1,225 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+
+NEWEST_FIRST = 'newest'
+OLDEST_FIRST = 'oldest'
+STALE_FIRST = 'stale'
+POLICIES = (NEWEST_FIRST, OLDEST_FIRST, STALE_FIRST)
+
+# The months the crawl originally walked: 2020-11 back to 2011-01
+DEFAULT_RANGES = (((2011, 1), (2020, 11)),)
+
+
+def parse_month(text):
+    year, month = (int(part) for part in text.strip().split('-'))
+    if not 1 <= month <= 12:
+        raise ValueError(f"invalid month: {text!r}")
+    return year, month
+
+
+def parse_ranges(text):
+    # "2019-01:2020-11,2015-06" -> [((2019, 1), (2020, 11)), ((2015, 6), (2015, 6))]; either end may come first
+    ranges = []
+    for part in text.split(','):
+        if part.strip():
+            first, _, last = part.partition(':')
+            ranges.append(tuple(sorted((parse_month(first), parse_month(last or first)))))
+    return ranges
+
+
+def parse_retry_after(value):
+    # Only the delay-seconds form; an HTTP date falls back to the AIMD cut alone
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class SitemapScheduler:
+    # Which monthly sitemaps a crawl visits, and in what order:
+    #   newest  - most recent month first (the original order)
+    #   oldest  - oldest month first
+    #   stale   - least recently crawled first: never-visited months, then unfinished ones, then finished
+    #             ones by when they were last completed
+    # Finished sitemaps are skipped unless recrawl_after (seconds) has passed since they were completed,
+    # which picks up articles published after the last crawl of a month.
+    def __init__(self, parser, state, ranges=DEFAULT_RANGES, policy=NEWEST_FIRST, recrawl_after=None):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy {policy!r}, expected one of {', '.join(POLICIES)}")
+        self.parser = parser
+        self.state = state
+        self.ranges = ranges
+        self.policy = policy
+        self.recrawl_after = recrawl_after
+
+    def sitemap_urls(self):
+        urls = set()
+        for oldest, newest in self.ranges:
+            urls.update(self.parser.generate_sitemap_urls(newest, oldest))
+        urls = sorted(urls, key=sitemap_month, reverse=True)  # Overlapping ranges list a month once
+        if self.policy == OLDEST_FIRST:
+            urls.reverse()
+
+        status = self.state.sitemap_status()
+        if self.policy == STALE_FIRST:
+            # sorted() is stable, so ties (every never-visited month) keep the newest-first order
+            urls.sort(key=lambda url: (status[url][0] == self.state.DONE, status[url][1]) if url in status
+                      else (False, 0.0))
+
+        now = time.time()
+        scheduled = []
+        for url in urls:
+            if url in status and status[url][0] == self.state.DONE:
+                if self.recrawl_after is None or now - status[url][1] < self.recrawl_after:
+                    print(f"Skipping finished sitemap: {url}")
+                    continue
+                print(f"Re-crawling sitemap finished {(now - status[url][1]) / 86400:.1f} days ago: {url}")
+            scheduled.append(url)
+        return scheduled
+
+
+def sitemap_month(sitemap_url):
+    year, month = sitemap_url.split('-')[-2], sitemap_url.split('-')[-1].replace('.xml', '')
+    return int(year), int(month)
+
+
+class AimdLimit:
+    # Concurrency window for one host, adjusted like TCP congestion control: every good response
+    # widens it by increase / window (about +increase per window's worth of responses), and a
+    # 429/5xx, a failed request or a response much slower than the host's usual latency multiplies
+    # it by decrease. Only one cut per round trip, since responses already in flight saw the same
+    # congestion.
+    def __init__(self, initial=4, minimum=1, maximum=32, increase=1.0, decrease=0.5, latency_tolerance=3.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.baseline = None  # Moving average of healthy responses' latency
+        self.smoothed = 0.0
+        self.last_decrease = 0.0
+        self.decreases = 0
+
+    @property
+    def window(self):
+        return max(self.minimum, int(self.limit))
+
+    def record(self, latency, status):
+        now = time.monotonic()
+        self.smoothed = latency if not self.smoothed else 0.8 * self.smoothed + 0.2 * latency
+        failed = status is None or status == 429 or status >= 500
+        # Compared against an average rather than the fastest response seen, so ordinary jitter on a
+        # healthy host does not count as congestion; a sustained slowdown becomes the new normal
+        congested = failed or (self.baseline is not None and latency > self.baseline * self.latency_tolerance)
+        if not failed:
+            self.baseline = latency if self.baseline is None else 0.9 * self.baseline + 0.1 * latency
+        if not congested:
+            self.limit = min(float(self.maximum), self.limit + self.increase / self.limit)
+        elif now - self.last_decrease >= self.smoothed:
+            self.limit = max(float(self.minimum), self.limit * self.decrease)
+            self.last_decrease = now
+            self.decreases += 1
+
+
+class HostLimits:
+    # Per-host AIMD windows, in-flight counts and Retry-After pauses; the blocking and asyncio
+    # limiters below only add the waiting
+    def __init__(self, **aimd_options):
+        self.aimd_options = aimd_options
+        self.limits = {}
+        self.in_flight = Counter()
+        self.paused_until = {}
+
+    def limit_for(self, host):
+        if host not in self.limits:
+            self.limits[host] = AimdLimit(**self.aimd_options)
+        return self.limits[host]
+
+    def can_start(self, host):
+        return self.in_flight[host] < self.limit_for(host).window
+
+    def pause_remaining(self, host):
+        return self.paused_until.get(host, 0.0) - time.monotonic()
+
+    def finished(self, host, latency, status, retry_after=None):
+        # status is None for requests that failed without a response
+        self.in_flight[host] -= 1
+        self.limit_for(host).record(latency, status)
+        delay = parse_retry_after(retry_after)
+        if delay:
+            self.paused_until[host] = max(self.paused_until.get(host, 0.0), time.monotonic() + delay)
+
+    def print_stats(self):
+        for host, limit in sorted(self.limits.items()):
+            print(f"Concurrency for {host}: window {limit.window}, {limit.decreases} cuts, "
+                  f"latency {limit.smoothed * 1000:.0f} ms (baseline {(limit.baseline or 0) * 1000:.0f} ms)")
+
+
+class AsyncHostLimiter(HostLimits):
+    def __init__(self, **aimd_options):
+        super().__init__(**aimd_options)
+        self.condition = asyncio.Condition()
+
+    async def acquire(self, host):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.can_start(host))
+            self.in_flight[host] += 1
+        pause = self.pause_remaining(host)
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+    async def release(self, host, latency, status, retry_after=None):
+        async with self.condition:
+            self.finished(host, latency, status, retry_after)
+            self.condition.notify_all()
+
+
+class HostLimiter(HostLimits):
+    # Blocking version for CrawlPipeline's fetch threads
+    def __init__(self, **aimd_options):
+        super().__init__(**aimd_options)
+        self.condition = threading.Condition()
+
+    def acquire(self, host):
+        with self.condition:
+            self.condition.wait_for(lambda: self.can_start(host))
+            self.in_flight[host] += 1
+        pause = self.pause_remaining(host)
+        if pause > 0:
+            time.sleep(pause)
+
+    def release(self, host, latency, status, retry_after=None):
+        with self.condition:
+            self.finished(host, latency, status, retry_after)
+            self.condition.notify_all()
+
+
+class ArticleBudget:
+    # The crawl's global article cap, shared by all parallel workers. A worker reserves a slot before
+    # fetching and releases it once the page is settled, as a saved article or not, so the workers
+    # together never fetch more pages than the budget can still use. total=None is unlimited.
+    def __init__(self, total=None):
+        self.total = total
+        self.saved = 0
+        self.reserved = 0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        with self.lock:
+            if self.total is not None and self.saved + self.reserved >= self.total:
+                return False
+            self.reserved += 1
+            return True
+
+    def release(self, saved=False):
+        with self.lock:
+            self.reserved -= 1
+            if saved:
+                self.saved += 1
+
+    @property
+    def exhausted(self):
+        return self.total is not None and self.saved >= self.total
@@ -0,0 +1,67 @@
+import re
+
+from pymongo import TEXT, IndexModel
+
+# Harakat (fathatan .. sukun), superscript alef and tatweel carry no meaning for search
+ARABIC_DIACRITICS = re.compile('[\u064B-\u0652\u0670\u0640]')
+ARABIC_LETTER_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',  # Alef variants
+    'ى': 'ي',  # Alef maqsura
+    'ة': 'ه',  # Ta marbuta
+    'ؤ': 'و',
+    'ئ': 'ي',
+})
+TOKEN_PATTERN = re.compile(r'\w+')
+
+MAX_PER_PAGE = 100
+
+# MongoDB has no Arabic stemmer, so the text index works on our own normalized tokens ("none" language)
+SEARCH_INDEX = IndexModel(
+    [("search_text", TEXT), ("search_keywords", TEXT)],
+    name="search_text",
+    weights={"search_keywords": 5, "search_text": 1},
+    default_language="none",
+    language_override="search_language",
+)
+
+
+def normalize_text(text):
+    text = ARABIC_DIACRITICS.sub('', text or '')
+    return text.translate(ARABIC_LETTER_MAP).lower()
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(normalize_text(text))
+
+
+def normalize_keyword(keyword):
+    # A keyword as stored in search_keywords: its tokens, normalized, separated by single spaces
+    return ' '.join(tokenize(keyword))
+
+
+def search_fields(document):
+    # Fields stored at ingest for the text index
+    keywords = document.get("keywords") if isinstance(document.get("keywords"), list) else []
+    return {
+        "search_text": ' '.join(tokenize(f"{document.get('title') or ''} {document.get('content') or ''}")),
+        "search_keywords": [normalize_keyword(keyword) for keyword in keywords if isinstance(keyword, str)],
+    }
+
+
+def text_query(text):
+    # The whole input as one quoted phrase. Tokenizing drops quotes and operators, so user input
+    # can never change the meaning of the $text search.
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    return {"$text": {"$search": '"' + ' '.join(tokens) + '"'}}
+
+
+def page_arguments(args):
+    # ?page=2&per_page=20, clamped so a client cannot ask for the whole corpus at once
+    try:
+        page = max(int(args.get("page", 1)), 1)
+        per_page = min(max(int(args.get("per_page", 20)), 1), MAX_PER_PAGE)
+    except ValueError:
+        page, per_page = 1, 20
+    return page, per_page
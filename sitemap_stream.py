@@ -0,0 +1,51 @@
+import zlib
+import xml.etree.ElementTree as ET
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def local_name(tag):
+    # "{http://www.sitemaps.org/schemas/sitemap/0.9}loc" -> "loc"
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_sitemap_entries(chunks):
+    # Yields ('url', loc) for <urlset> entries and ('sitemap', loc) for <sitemapindex> entries
+    # as the bytes arrive. Elements are dropped from the tree once read, so memory stays flat.
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    decompressor = None
+    root = None
+    loc = None
+    first_chunk = True
+
+    def read_events():
+        nonlocal root, loc
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+            name = local_name(elem.tag)
+            if name == 'loc':
+                loc = (elem.text or '').strip()
+            elif name in ('url', 'sitemap'):
+                if loc:
+                    yield name, loc
+                loc = None
+                root.clear()
+
+    for chunk in chunks:
+        if first_chunk:
+            first_chunk = False
+            # .xml.gz sitemaps arrive as raw gzip (no Content-Encoding), so detect them by magic bytes
+            if chunk[:2] == GZIP_MAGIC:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        parser.feed(chunk)
+        yield from read_events()
+
+    if decompressor is not None:
+        parser.feed(decompressor.flush())
+    parser.close()
+    yield from read_events()
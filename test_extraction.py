@@ -0,0 +1,26 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+from bench_extraction import GOLDEN_DIRECTORY, load_expected, page_url
+from extraction import BACKENDS
+from main import ArticleScraper
+
+
+def golden_cases():
+    for name in sorted(os.listdir(GOLDEN_DIRECTORY)):
+        if not name.endswith(".html"):
+            continue
+        for backend in BACKENDS:
+            yield pytest.param(backend, name, id=f"{backend}-{name}")
+
+
+@pytest.mark.parametrize("backend, name", list(golden_cases()))
+def test_backend_matches_golden_article(backend, name):
+    with open(os.path.join(GOLDEN_DIRECTORY, name), "rb") as f:
+        content = f.read()
+    with contextlib.redirect_stdout(io.StringIO()):
+        article = ArticleScraper(page_url(name), backend=backend).parse(content)
+    assert (article.to_dict() if article else None) == load_expected(name)
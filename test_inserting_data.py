@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from indexes import INDEXES
+from inserting_data import load
+from rollups import ROLLUP_PIPELINES, rebuild_rollups
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def write_article(directory, name, **fields):
+    article = {"post_id": "No Post ID", "title": "title", "author": "author", "keywords": ["news"], "lang": "ar",
+               "content": "some words", "publication_date": "2020-11-01T10:00:00+03:00", **fields}
+    with open(directory / f"article_{name}.json", "w", encoding="utf-8") as f:
+        json.dump(article, f, ensure_ascii=False)
+
+
+@pytest.fixture
+def collection():
+    collection = mongomock.MongoClient()["almayadeen"]["articles"]
+    # mongomock's create_indexes drops partialFilterExpression, which would make the unique post_id
+    # index cover nulls; creating the indexes one by one keeps every option, as MongoDB does
+    for index in INDEXES:
+        options = dict(index.document)
+        collection.create_index(list(options.pop("key").items()), **options)
+    return collection
+
+
+def test_pages_without_post_id_load_by_url(tmp_path, collection):
+    month = tmp_path / "2020_11"
+    month.mkdir()
+    write_article(month, "1", url="https://www.almayadeen.net/article/1")
+    write_article(month, "2", url="https://www.almayadeen.net/article/2")
+
+    assert load(collection, str(tmp_path), workers=1) == (2, 2)
+    assert load(collection, str(tmp_path), workers=1) == (2, 0)  # Reloading updates them in place
+    assert collection.count_documents({}) == 2
+    assert collection.count_documents({"post_id": None}) == 2
+
+
+def rollup_counts(collection):
+    return {name: sorted((document["_id"] or "", document["count"]) for document in collection.database[name].find())
+            for name in ROLLUP_PIPELINES}
+
+
+@pytest.mark.parametrize("batch_size, workers", [(1000, 1), (1, 1), (1, 4)])
+def test_article_in_two_months_is_counted_once(tmp_path, collection, batch_size, workers):
+    for month in ("2020_10", "2020_11"):
+        (tmp_path / month).mkdir()
+        write_article(tmp_path / month, "42", post_id="42", url="https://www.almayadeen.net/article/42")
+
+    assert load(collection, str(tmp_path), batch_size=batch_size, workers=workers) == (2, 1)
+    load(collection, str(tmp_path), batch_size=batch_size, workers=workers)
+    incremental = rollup_counts(collection)
+    assert incremental["keyword_counts"] == [("news", 1)]
+    assert incremental["author_counts"] == [("author", 1)]
+
+    rebuild_rollups(collection)
+    assert rollup_counts(collection) == incremental
@@ -0,0 +1,39 @@
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from bench_api_modes import in_memory_client
+from response_cache import LocalCache
+
+mongomock = pytest.importorskip("mongomock")
+flask_app = pytest.importorskip("flask_app")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(flask_app, "db", in_memory_client(300)["almayadeen"])
+    monkeypatch.setattr(flask_app.response_cache, "backend", LocalCache())
+    return flask_app.app.test_client()
+
+
+def next_link(response):
+    link = response.headers["Link"]
+    assert link.endswith('>; rel="next"')
+    return urlsplit(link[1:-len('>; rel="next"')])
+
+
+def test_next_link_keeps_path_params_when_a_query_arg_has_the_same_name(client):
+    response = client.get("/articles_by_keyword/keyword-1?keyword=x&limit=1&fields=post_id")
+    assert response.status_code == 200
+    assert len(response.get_json()) == 1
+
+    link = next_link(response)
+    assert link.path == "/articles_by_keyword/keyword-1"
+    args = parse_qs(link.query)
+    assert args["keyword"] == ["x"]  # Passed through untouched, not swapped into the path
+    assert args["limit"] == ["1"]
+    assert args["cursor"] == [response.headers["X-Next-Cursor"]]
+
+    following = client.get(f"{link.path}?{link.query}")
+    assert following.status_code == 200
+    assert following.get_json() != response.get_json()
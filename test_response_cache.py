@@ -0,0 +1,65 @@
+from collections import Counter
+
+import pytest
+from flask import Flask, jsonify, request
+
+from response_cache import LocalCache, ResponseCache, bump_generation, read_generation
+
+mongomock = pytest.importorskip("mongomock")
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()["almayadeen"]
+
+
+@pytest.fixture
+def calls():
+    return Counter()
+
+
+@pytest.fixture
+def client(db, calls):
+    app = Flask(__name__)
+
+    @app.route("/articles_by_keyword/<keyword>")
+    def articles_by_keyword(keyword):
+        calls[request.full_path] += 1
+        return jsonify({"keyword": keyword, "limit": request.args.get("limit")})
+
+    # Check the generation on every request so a bump is seen straight away
+    cache = ResponseCache(LocalCache(), lambda: read_generation(db), generation_check_interval=0)
+    cache.init_app(app)
+    return app.test_client()
+
+
+def test_second_request_is_a_hit(client, calls):
+    first = client.get("/articles_by_keyword/news")
+    second = client.get("/articles_by_keyword/news")
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.get_json() == first.get_json()
+    assert sum(calls.values()) == 1
+
+
+def test_matching_if_none_match_gets_304(client):
+    etag = client.get("/articles_by_keyword/news").headers["ETag"]
+    response = client.get("/articles_by_keyword/news", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.get_data() == b""
+
+
+def test_path_params_and_query_args_are_part_of_the_key(client, calls):
+    client.get("/articles_by_keyword/news")
+    assert client.get("/articles_by_keyword/sport").headers["X-Cache"] == "MISS"
+    assert client.get("/articles_by_keyword/news?limit=5").headers["X-Cache"] == "MISS"
+    assert client.get("/articles_by_keyword/news?limit=5").get_json() == {"keyword": "news", "limit": "5"}
+    assert sum(calls.values()) == 3
+
+
+def test_bump_generation_invalidates_entries(client, db, calls):
+    client.get("/articles_by_keyword/news")
+    bump_generation(db)
+    response = client.get("/articles_by_keyword/news")
+    assert response.headers["X-Cache"] == "MISS"
+    assert calls["/articles_by_keyword/news?"] == 2
@@ -0,0 +1,55 @@
+import random
+import time
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+from http_transport import HttpTransport
+from mock_site import start_mock_site
+from pipeline import CrawlPipeline
+from scheduler import AimdLimit, HostLimiter
+
+
+def test_429_cuts_the_aimd_window():
+    limit = AimdLimit(initial=8)
+    for _ in range(5):
+        limit.record(0.01, 200)
+    window = limit.window
+    limit.record(0.01, 429)
+    assert limit.window == window // 2
+    assert limit.decreases == 1
+
+
+def test_jittery_latency_keeps_the_aimd_window():
+    # A healthy host whose responses take anywhere from 5 to 50 ms, the slowest ones included
+    limit = AimdLimit(initial=8, maximum=16)
+    jitter = random.Random(0)
+    for _ in range(500):
+        limit.record(jitter.uniform(0.005, 0.05), 200)
+    assert limit.decreases == 0
+    assert limit.window == 16
+
+
+@pytest.fixture
+def throttling_site():
+    site = start_mock_site(error_rate=1.0, error_status=429, retry_after=1)
+    yield site
+    site.shutdown()
+
+
+def test_pipeline_429_shrinks_host_window_and_pauses(throttling_site):
+    # The transport must hand 429s to the limiter instead of absorbing them in urllib3's retries
+    url = f"{throttling_site.base_url}/article/1"
+    host = urlsplit(url).netloc
+    limiter = HostLimiter(initial=8)
+    with HttpTransport(retry_statuses=()) as transport, \
+            CrawlPipeline(transport.fetch, limiter=limiter, max_retries=1) as pipeline:
+        started = time.monotonic()
+        with pytest.raises(requests.HTTPError):
+            pipeline.fetch_with_limit(url)
+
+    assert limiter.limit_for(host).window < 8
+    assert throttling_site.stats["errors"] == 2  # The first request and one retry, nothing hidden
+    assert time.monotonic() - started >= 1  # The retry waited out Retry-After
+    assert limiter.in_flight[host] == 0